@@ -0,0 +1,58 @@
+"""
+Версия набора данных из таблицы dataset_versions.
+
+Версию увеличивает триггер на каждую запись в fortresses (см. models.py и
+миграцию 58037deae79f). In-process кэши сравнивают её со своей и
+пересобираются, только когда данные действительно изменились.
+
+Чтобы не ходить в БД на каждый запрос, версия кэшируется на
+DATASET_VERSION_TTL секунд — это верхняя граница задержки, с которой
+процесс увидит свежие данные после синхронизации. Ошибка подключения
+кэшируется на тот же срок: при недоступной БД запросы не ждут таймаут
+подключения каждый раз.
+"""
+import os
+import time
+from typing import Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from ..database import async_engine, DB_ERRORS
+
+DATASET_VERSION_TTL: float = float(os.getenv("DATASET_VERSION_TTL", "1.0"))
+
+FORTRESSES = "fortresses"
+
+# name -> (время проверки, версия или ошибка подключения)
+_checked: dict[str, tuple[float, Union[int, None, Exception]]] = {}
+
+
+async def get_dataset_version(name: str = FORTRESSES) -> Optional[int]:
+    """Текущая версия набора данных или None, если версия неизвестна.
+
+    None означает, что миграция с dataset_versions ещё не применена —
+    вызывающий код в этом случае не должен кэшировать результат.
+    Ошибки подключения к БД пробрасываются (database.DB_ERRORS) — в
+    течение DATASET_VERSION_TTL без повторной попытки.
+    """
+    now = time.monotonic()
+    hit = _checked.get(name)
+    if hit is not None and now - hit[0] < DATASET_VERSION_TTL:
+        if isinstance(hit[1], Exception):
+            raise hit[1].with_traceback(None)
+        return hit[1]
+
+    try:
+        async with async_engine.connect() as conn:
+            try:
+                version = (await conn.execute(
+                    text("SELECT version FROM dataset_versions WHERE name = :name"), {"name": name}
+                )).scalar()
+            except ProgrammingError:
+                version = None
+    except DB_ERRORS as e:
+        _checked[name] = (now, e)
+        raise
+    _checked[name] = (now, version)
+    return version
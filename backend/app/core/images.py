@@ -0,0 +1,150 @@
+"""
+Производные размеры изображений (миниатюры и веб-версии).
+
+Для каждого загруженного фото строятся варианты фиксированной ширины в
+WebP (IMAGE_VARIANT_WIDTHS). Ресайз — CPU-тяжёлая работа, поэтому он
+выполняется в отдельном ProcessPoolExecutor (IMAGE_WORKERS процессов),
+а не в воркерах API.
+
+Варианты строятся во временном каталоге и затем сохраняются в хранилище
+(core.storage) рядом с оригиналом: 'ab/cd/<sha256>_w320.webp'.
+
+Для внешних картинок (Wikimedia Commons) свои файлы не строим: у
+Commons есть штатные URL миниатюр нужной ширины.
+
+Pillow — необязательная зависимость: без неё варианты совпадают с
+оригиналом.
+"""
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote, unquote
+
+from ..schemas import ImageVariants
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # pragma: no cover - Pillow не установлен
+    Image = None
+
+# имя варианта -> ширина в пикселях
+IMAGE_VARIANT_WIDTHS: dict[str, int] = {"thumb": 320, "medium": 1280}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: родитель многопоточный и держит соединения с БД
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def variant_filename(name: str, width: int) -> str:
+    """'abc.jpg' -> 'abc_w320.webp'"""
+    return f"{Path(name).stem}_w{width}.webp"
+
+
+def variant_key(key: str, width: int) -> str:
+    """'ab/cd/abc.jpg' -> 'ab/cd/abc_w320.webp'"""
+    head, _, name = key.rpartition("/")
+    return f"{head}/{variant_filename(name, width)}" if head else variant_filename(name, width)
+
+
+class UndecodableImageError(Exception):
+    """Файл не удалось прочитать как изображение (не картинка, обрезан, слишком велик)."""
+
+
+def _decode(src_path: str):
+    """Открывает и полностью декодирует картинку; ошибки чтения — UndecodableImageError."""
+    try:
+        with Image.open(src_path) as im:
+            im.verify()
+        # после verify() файл надо открыть заново
+        im = Image.open(src_path)
+        im.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise UndecodableImageError(str(e)) from None
+    return im
+
+
+def render_variants(src_path: str, dest_prefix: str, widths: dict[str, int]) -> dict[str, str]:
+    """Строит WebP-варианты в файлы '<dest_prefix>_w<ширина>.webp' (выполняется в процессе пула).
+
+    Возвращает {имя варианта: путь к файлу}. Картинка уже нужной ширины
+    не увеличивается — сохраняется в WebP в исходном размере. Ошибки
+    декодирования — UndecodableImageError; ошибки записи вариантов
+    (нет места и т. п.) пробрасываются как есть, недописанные файлы
+    удаляются.
+    """
+    result: dict[str, str] = {}
+    with _decode(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+        try:
+            for variant, width in widths.items():
+                dest = f"{dest_prefix}_w{width}.webp"
+                result[variant] = dest
+                out = im
+                if im.width > width:
+                    out = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+                out.save(dest, "WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        except BaseException:
+            for dest in result.values():
+                Path(dest).unlink(missing_ok=True)
+            raise
+    return result
+
+
+async def build_variants(src_path: str, dest_prefix: str) -> dict[str, str]:
+    """Варианты локального файла src_path в пуле процессов: {имя варианта: путь}.
+
+    Если Pillow нет или файл не декодируется как картинка — пустой
+    словарь, варианты тогда указывают на оригинал. Ошибки записи
+    вариантов и сбои самого пула (BrokenProcessPool и т. п.) не
+    глотаются.
+    """
+    if Image is None:
+        return {}
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), render_variants, src_path, dest_prefix, IMAGE_VARIANT_WIDTHS)
+    except UndecodableImageError:
+        return {}
+
+
+_COMMONS_FILE = re.compile(
+    r"^https?://(?:commons\.wikimedia\.org/wiki/Special:FilePath/"
+    r"|upload\.wikimedia\.org/wikipedia/commons/[0-9a-f]/[0-9a-f]{2}/)(?P<name>[^/?#]+)"
+)
+
+
+def external_variants(url: str) -> ImageVariants:
+    """Варианты для внешнего URL: миниатюры Wikimedia Commons, иначе оригинал.
+
+    Special:FilePath?width= сам перенаправляет на миниатюру нужной ширины
+    и, в отличие от прямых /thumb/ URL, не падает, если оригинал меньше
+    запрошенной ширины.
+    """
+    m = _COMMONS_FILE.match(url)
+    if not m:
+        return ImageVariants(original=url, **{v: url for v in IMAGE_VARIANT_WIDTHS})
+    base = f"https://commons.wikimedia.org/wiki/Special:FilePath/{quote(unquote(m.group('name')))}"
+    return ImageVariants(original=url, **{v: f"{base}?width={w}" for v, w in IMAGE_VARIANT_WIDTHS.items()})
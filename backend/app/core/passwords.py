@@ -0,0 +1,75 @@
+"""
+Хэширование и проверка паролей в отдельном пуле процессов.
+
+pbkdf2 намеренно медленный (десятки миллисекунд CPU на вызов). В общем
+пуле потоков Starlette всплеск логинов занимал все потоки и держал GIL,
+и от этого страдали обычные GET. Здесь хэширование вынесено в
+собственный ProcessPoolExecutor на PASSWORD_HASH_WORKERS процессов.
+
+Контроль допуска: одновременно в пуле (в работе и в очереди) не больше
+PASSWORD_HASH_MAX_PENDING задач. Лишние запросы сразу получают 503 с
+Retry-After, а не копятся в очереди, растягивая латентность всем.
+
+Стоимость хэша задаёт PASSWORD_HASH_ROUNDS (core.security).
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+
+from . import security
+
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_RETRY_AFTER: int = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: родитель многопоточный и держит соединения с БД
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Сервер перегружен, повторите попытку позже",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(security.get_password_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _submit(security.verify_password, plain_password, hashed_password)
+
+
+def pending() -> int:
+    """Задач в пуле сейчас (для метрик)."""
+    return _pending
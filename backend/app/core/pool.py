@@ -0,0 +1,152 @@
+"""
+Настройки и метрики пула соединений с БД.
+
+Все параметры пула читаются из переменных окружения, чтобы их можно было
+подстраивать под конкретный деплой без изменения кода:
+
+  DB_POOL_SIZE          — постоянных соединений на воркер (по умолчанию 10);
+  DB_MAX_OVERFLOW       — дополнительных соединений сверх pool_size (20);
+  DB_POOL_TIMEOUT       — сколько секунд ждать свободное соединение (30);
+  DB_POOL_RECYCLE       — пересоздавать соединения старше N секунд (1800);
+  DB_POOL_PRE_PING      — проверять соединение перед выдачей (true);
+  DB_POOL_USE_LIFO      — выдавать последнее возвращённое соединение (true);
+  DB_MAX_CONNECTIONS    — общий бюджет соединений на все воркеры (опционально);
+  WEB_CONCURRENCY       — число воркеров uvicorn/gunicorn (1).
+
+Если задан DB_MAX_CONNECTIONS, бюджет делится между воркерами: каждый
+получает pool_size + max_overflow <= DB_MAX_CONNECTIONS // WEB_CONCURRENCY,
+и суммарно процессы не превысят max_connections сервера Postgres.
+
+Бюджет относится к async_engine — единственному движку, через который
+ходят запросы API. Синхронный engine (скрипты, alembic) пул не держит.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING: bool = _env_bool("DB_POOL_PRE_PING", True)
+DB_POOL_USE_LIFO: bool = _env_bool("DB_POOL_USE_LIFO", True)
+DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+WEB_CONCURRENCY: int = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def worker_pool_sizes() -> tuple[int, int]:
+    """Возвращает (pool_size, max_overflow) для одного воркера.
+
+    Без DB_MAX_CONNECTIONS используются значения как есть. С ним — доля
+    бюджета на воркер, в которой сохраняется исходное соотношение
+    pool_size / max_overflow.
+    """
+    pool_size, max_overflow = DB_POOL_SIZE, DB_MAX_OVERFLOW
+    if DB_MAX_CONNECTIONS <= 0:
+        return pool_size, max_overflow
+
+    per_worker = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+    total = pool_size + max_overflow
+    if total <= per_worker:
+        return pool_size, max_overflow
+    scaled_size = max(1, per_worker * pool_size // total)
+    return scaled_size, per_worker - scaled_size
+
+
+# ---------------------------------------------------------------------------
+# Метрики
+# ---------------------------------------------------------------------------
+
+class PoolMetrics:
+    """Счётчики ожидания соединения из пула (потокобезопасно)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "waitTotalMs": round(self.wait_total * 1000, 3),
+                "waitAvgMs": round(self.wait_total * 1000 / total, 3) if total else 0.0,
+                "waitMaxMs": round(self.wait_max * 1000, 3),
+            }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул async_engine, замеряющий время получения соединения (_do_get)."""
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return conn
+
+
+def engine_pool_kwargs() -> dict:
+    """Аргументы пула для create_async_engine()."""
+    pool_size, max_overflow = worker_pool_sizes()
+    return {
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_use_lifo": DB_POOL_USE_LIFO,
+    }
+
+
+def pool_stats(engine) -> dict:
+    """Текущее состояние пула движка: занятые соединения, overflow, ожидание.
+
+    Принимает как Engine, так и AsyncEngine.
+    """
+    pool = getattr(engine, "sync_engine", engine).pool
+    stats = {
+        "poolSize": pool.size(),
+        "checkedOut": pool.checkedout(),
+        "checkedIn": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
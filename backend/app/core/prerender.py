@@ -0,0 +1,85 @@
+"""
+Заранее сериализованные и сжатые тела ответов.
+
+Для редко меняющихся ответов (список кремлей) JSON и его gzip/brotli
+версии считаются один раз на версию данных; на запрос остаётся только
+выбрать вариант по Accept-Encoding.
+
+brotli — необязательная зависимость: без неё отдаются только gzip и
+несжатый вариант.
+"""
+import gzip
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli не установлен
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Меньше этого размера сжатие не окупает заголовки и CPU клиента
+MIN_COMPRESS_SIZE = 512
+
+
+@dataclass(frozen=True)
+class PrerenderedBody:
+    """Тело ответа в трёх кодировках и соответствующие им ETag."""
+    identity: bytes
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+    etag: Optional[str] = None
+
+    @classmethod
+    def render(cls, data: bytes, etag: Optional[str] = None) -> "PrerenderedBody":
+        if len(data) < MIN_COMPRESS_SIZE:
+            return cls(identity=data, etag=etag)
+        return cls(
+            identity=data,
+            gzip=gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0),
+            br=brotli.compress(data, quality=BROTLI_QUALITY) if brotli is not None else None,
+            etag=etag,
+        )
+
+    def pick(self, accept_encoding: Optional[str]) -> tuple[bytes, Optional[str], Optional[str]]:
+        """Возвращает (тело, Content-Encoding, ETag) для заголовка Accept-Encoding."""
+        accepted = parse_accept_encoding(accept_encoding)
+        best: Optional[tuple[float, str]] = None
+        # При равном q предпочитаем brotli — он заметно компактнее gzip на JSON
+        for encoding in ("br", "gzip"):
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if getattr(self, encoding) is not None and q > 0 and (best is None or q > best[0]):
+                best = (q, encoding)
+        if best is None:
+            return self.identity, None, self.etag
+        encoding = best[1]
+        return getattr(self, encoding), encoding, self._etag_for(encoding)
+
+    def _etag_for(self, encoding: str) -> Optional[str]:
+        # Сильный ETag различается для разных представлений (RFC 9110, 8.8.3)
+        if self.etag is None:
+            return None
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+def parse_accept_encoding(header: Optional[str]) -> dict[str, float]:
+    """'gzip, br;q=0.5, *;q=0' -> {'gzip': 1.0, 'br': 0.5, '*': 0.0}"""
+    result: dict[str, float] = {}
+    if not header:
+        return result
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[name] = q
+    return result
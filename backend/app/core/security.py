@@ -1,14 +1,27 @@
 from datetime import datetime, timedelta
+import hashlib
 import os
+import time
 from typing import Optional
 
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 
+from .lru import LRUCache
+
 SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM: str = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24 * 7)))
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Кэш проверенных токенов: повторные запросы с тем же токеном не считают HMAC и не парсят JSON
+TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL: float = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+# Число итераций pbkdf2 для новых хэшей; существующие хэши проверяются со своим числом
+PASSWORD_HASH_ROUNDS: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+pwd_context = CryptContext(
+	schemes=["pbkdf2_sha256"],
+	deprecated="auto",
+	pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+)
 
 
 def get_password_hash(password: str) -> str:
@@ -34,4 +47,21 @@ def decode_access_token(token: str) -> dict:
 		raise
 
 
+_token_cache: LRUCache[dict] = LRUCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+def verify_access_token(token: str) -> dict:
+	"""decode_access_token с кэшем проверенных payload.
 
+	Ключ — sha256 токена (сами токены в памяти не храним). Запись живёт
+	не дольше TOKEN_CACHE_TTL и не дольше срока действия токена, так что
+	истёкший токен из кэша не примется. Ошибки проверки не кэшируются.
+	"""
+	key = hashlib.sha256(token.encode()).digest()
+	payload = _token_cache.get(key)
+	if payload is None:
+		payload = decode_access_token(token)
+		exp = payload.get("exp")
+		ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+		_token_cache.set(key, payload, ttl)
+	return dict(payload)
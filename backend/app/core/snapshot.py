@@ -0,0 +1,52 @@
+"""
+Кэш снимков, привязанных к версии набора данных.
+
+Снимок пересобирается только при смене версии; одновременные запросы
+во время пересборки ждут одну сборку, а не запускают каждый свою.
+"""
+import asyncio
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SnapshotCache(Generic[T]):
+    """Хранит одно значение для последней увиденной версии."""
+
+    def __init__(self) -> None:
+        self._version: Optional[int] = None
+        self._value: Optional[T] = None
+        self._lock = asyncio.Lock()
+
+    def peek(self, version: Optional[int]) -> Optional[T]:
+        if version is not None and version == self._version:
+            return self._value
+        return None
+
+    async def get(self, version: Optional[int], build: Callable[[], Awaitable[T]]) -> T:
+        """Возвращает снимок для version, при необходимости собирая его через build().
+
+        Для version=None (версия неизвестна) снимок собирается без кэширования.
+        """
+        if version is None:
+            return await build()
+        value = self.peek(version)
+        if value is not None:
+            return value
+        async with self._lock:
+            value = self.peek(version)
+            if value is not None:
+                return value
+            value = await build()
+            self._version, self._value = version, value
+            return value
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Проверка заголовка If-None-Match (RFC 9110, слабое сравнение)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == target for tag in if_none_match.split(","))
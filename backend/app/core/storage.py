@@ -0,0 +1,236 @@
+"""
+Хранилище загруженных файлов.
+
+Бэкенд выбирается переменной STORAGE_BACKEND:
+
+  local (по умолчанию) — каталог static/uploads, раздаётся через /static;
+  s3                   — S3-совместимое хранилище (AWS S3, MinIO, Yandex
+                         Object Storage). Настройки:
+      S3_BUCKET, S3_ENDPOINT_URL (для MinIO, напр. http://localhost:9000),
+      S3_REGION, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY,
+      S3_PUBLIC_URL — база публичных URL (по умолчанию <endpoint>/<bucket>).
+
+Ключи файлов — адреса по содержимому ('ab/cd/<sha256>.jpg', см. uploads),
+поэтому объект по ключу никогда не меняется и кэшируется как immutable.
+
+S3-бэкенд загружает крупные файлы по частям (multipart, части уходят
+параллельно) и умеет выдавать presigned PUT URL: клиент грузит фото прямо
+в хранилище, байты не проходят через API. Подпись включает размер и
+sha256 содержимого, так что хранилище само отклонит файл, не
+совпадающий с заявленным ключом.
+
+boto3 — необязательная зависимость, нужна только для s3.
+"""
+import asyncio
+import base64
+import os
+import shutil
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Optional
+
+from anyio import to_thread
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - boto3 не установлен
+    boto3 = None
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+
+LOCAL_STORAGE_DIR = os.path.join("static", "uploads")
+LOCAL_STORAGE_URL_PREFIX = "/static/uploads"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+S3_PART_SIZE = 8 * 1024 * 1024
+S3_PART_CONCURRENCY = 4
+PRESIGN_EXPIRES_SECONDS = 15 * 60
+
+
+@dataclass(frozen=True)
+class PresignedPut:
+    """Куда и с какими заголовками клиент должен сделать PUT файла."""
+    url: str
+    method: str = "PUT"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class StorageBackend(ABC):
+    """Интерфейс хранилища; все операции ввода-вывода асинхронные."""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> None:
+        """Сохраняет локальный файл path под ключом key; path после вызова не нужен."""
+
+    @abstractmethod
+    async def get_file(self, key: str, path: str) -> None:
+        """Скачивает объект key в локальный файл path."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    async def presign_upload(self, key: str, size: int, sha256_hex: str, content_type: str) -> Optional[PresignedPut]:
+        """Presigned URL для прямой загрузки; None — бэкенд это не поддерживает."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str = LOCAL_STORAGE_DIR, url_prefix: str = LOCAL_STORAGE_URL_PREFIX) -> None:
+        self.root = root
+        self.url_prefix = url_prefix
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    async def exists(self, key: str) -> bool:
+        return await to_thread.run_sync(os.path.exists, self._path(key))
+
+    async def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> None:
+        await to_thread.run_sync(self._publish, path, self._path(key))
+
+    @staticmethod
+    def _publish(src: str, dest: str) -> None:
+        # Объект с таким ключом уже есть — содержимое то же самое
+        if os.path.exists(dest):
+            os.unlink(src)
+            return
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.replace(src, dest)
+        except OSError:
+            # временный каталог на другом разделе
+            shutil.move(src, dest)
+
+    async def get_file(self, key: str, path: str) -> None:
+        await to_thread.run_sync(shutil.copyfile, self._path(key), path)
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+
+class S3Storage(StorageBackend):
+    def __init__(self) -> None:
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 требует пакет boto3")
+        self.bucket = os.environ["S3_BUCKET"]
+        endpoint = os.getenv("S3_ENDPOINT_URL")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint,
+            region_name=os.getenv("S3_REGION", "us-east-1"),
+            aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY"),
+            config=BotoConfig(
+                signature_version="s3v4",
+                max_pool_connections=32,
+                s3={"addressing_style": "path" if endpoint else "auto"},
+            ),
+        )
+        default_public = f"{endpoint.rstrip('/')}/{self.bucket}" if endpoint else f"https://{self.bucket}.s3.amazonaws.com"
+        self.public_url = os.getenv("S3_PUBLIC_URL", default_public).rstrip("/")
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await to_thread.run_sync(lambda: self.client.head_object(Bucket=self.bucket, Key=key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    async def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> None:
+        extra = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra["ContentType"] = content_type
+        try:
+            size = os.path.getsize(path)
+            if size < S3_MULTIPART_THRESHOLD:
+                await to_thread.run_sync(self._put_small, key, path, extra)
+            else:
+                await self._put_multipart(key, path, size, extra)
+        finally:
+            await to_thread.run_sync(lambda: os.path.exists(path) and os.unlink(path))
+
+    def _put_small(self, key: str, path: str, extra: dict) -> None:
+        with open(path, "rb") as f:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=f, **extra)
+
+    async def _put_multipart(self, key: str, path: str, size: int, extra: dict) -> None:
+        """Multipart upload: части читаются и отправляются параллельно в пуле потоков."""
+        upload = await to_thread.run_sync(
+            lambda: self.client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)
+        )
+        upload_id = upload["UploadId"]
+        semaphore = asyncio.Semaphore(S3_PART_CONCURRENCY)
+
+        def send_part(number: int, offset: int) -> dict:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                body = f.read(S3_PART_SIZE)
+            res = self.client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body,
+            )
+            return {"PartNumber": number, "ETag": res["ETag"]}
+
+        async def bounded(number: int, offset: int) -> dict:
+            async with semaphore:
+                return await to_thread.run_sync(send_part, number, offset)
+
+        try:
+            parts = await asyncio.gather(*(
+                bounded(i + 1, offset) for i, offset in enumerate(range(0, size, S3_PART_SIZE))
+            ))
+            await to_thread.run_sync(lambda: self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": list(parts)},
+            ))
+        except BaseException:
+            await to_thread.run_sync(lambda: self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+            ))
+            raise
+
+    async def get_file(self, key: str, path: str) -> None:
+        await to_thread.run_sync(lambda: self.client.download_file(self.bucket, key, path))
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    async def presign_upload(self, key: str, size: int, sha256_hex: str, content_type: str) -> Optional[PresignedPut]:
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode()
+        params = {
+            "Bucket": self.bucket,
+            "Key": key,
+            "ContentType": content_type,
+            "ContentLength": size,
+            "ChecksumSHA256": checksum,
+            "CacheControl": IMMUTABLE_CACHE_CONTROL,
+        }
+        url = await to_thread.run_sync(lambda: self.client.generate_presigned_url(
+            "put_object", Params=params, ExpiresIn=PRESIGN_EXPIRES_SECONDS,
+        ))
+        # Эти заголовки входят в подпись — клиент обязан отправить их как есть
+        return PresignedPut(url=url, headers={
+            "Content-Type": content_type,
+            "Content-Length": str(size),
+            "x-amz-checksum-sha256": checksum,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        })
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = S3Storage() if STORAGE_BACKEND == "s3" else LocalStorage()
+    return _storage
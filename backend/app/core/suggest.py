@@ -0,0 +1,81 @@
+"""
+Префиксный индекс для автодополнения (GET /api/kremlins/suggest).
+
+Индекс — отсортированный массив ключей, поиск — bisect: O(log N) на
+запрос без обращения к БД. Ключи строятся из названия и города:
+
+  - нормализация: casefold, ё -> е, пунктуация -> пробел;
+  - каждое слово даёт свой ключ («кремль» находит «Казанский кремль»);
+  - к каждому ключу добавляется транслитерация («kazan» находит «Казань»).
+
+Совпадение с началом названия ранжируется выше совпадения со словом
+внутри названия, а оно — выше совпадения по городу.
+"""
+import re
+from bisect import bisect_left
+from typing import Iterable
+
+from ..schemas import KremlinListItem
+
+# Сколько совпадений просматривать на один запрос: короткий префикс
+# («к») совпадает с большой частью индекса
+SUGGEST_SCAN_LIMIT = 2000
+
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n",
+    "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f",
+    "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y",
+    "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """'Ростовский  Кремль (Ярославль)' -> 'ростовский кремль ярославль'"""
+    text = text.casefold().replace("ё", "е")
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def transliterate(normalized: str) -> str:
+    return normalized.translate(_TRANSLIT)
+
+
+# ранги совпадений: меньше — выше в выдаче
+_NAME_START, _NAME_WORD, _CITY = 0, 1, 2
+
+
+class SuggestIndex:
+    def __init__(self, items: Iterable[KremlinListItem]) -> None:
+        self.items = list(items)
+        entries: list[tuple[str, int, int]] = []
+        for idx, item in enumerate(self.items):
+            for text, first_rank, rest_rank in ((item.name, _NAME_START, _NAME_WORD), (item.city, _CITY, _CITY)):
+                if not text:
+                    continue
+                norm = normalize(text)
+                for variant in {norm, transliterate(norm)}:
+                    words = variant.split()
+                    for i in range(len(words)):
+                        entries.append((" ".join(words[i:]), first_rank if i == 0 else rest_rank, idx))
+        entries.sort()
+        self._keys = [key for key, _, _ in entries]
+        self._refs = [(rank, idx) for _, rank, idx in entries]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def suggest(self, prefix: str, limit: int) -> list[KremlinListItem]:
+        p = normalize(prefix)
+        if not p:
+            return []
+        best: dict[int, int] = {}
+        start = bisect_left(self._keys, p)
+        for i in range(start, min(start + SUGGEST_SCAN_LIMIT, len(self._keys))):
+            if not self._keys[i].startswith(p):
+                break
+            rank, idx = self._refs[i]
+            if rank < best.get(idx, rank + 1):
+                best[idx] = rank
+        ordered = sorted(best.items(), key=lambda kv: (kv[1], len(self.items[kv[0]].name), self.items[kv[0]].name))
+        return [self.items[idx] for idx, _ in ordered[:limit]]
@@ -0,0 +1,68 @@
+"""
+Дисковый кэш векторных тайлов (Mapbox Vector Tile).
+
+Тайлы лежат в TILE_CACHE_DIR/<версия данных>/<z>/<x>/<y>.pbf. Смена
+версии набора данных автоматически делает старые тайлы недостижимыми;
+каталоги прежних версий удаляются при первой записи тайла новой версии.
+
+Файловые операции выполняются в пуле потоков, чтобы не блокировать
+event loop.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from anyio import to_thread
+
+TILE_CACHE_DIR = Path(os.getenv("TILE_CACHE_DIR", os.path.join("cache", "tiles")))
+
+
+class TileCache:
+    def __init__(self, root: Path = TILE_CACHE_DIR) -> None:
+        self.root = root
+        self._pruned_for: Optional[int] = None
+
+    def _path(self, version: int, z: int, x: int, y: int) -> Path:
+        return self.root / str(version) / str(z) / str(x) / f"{y}.pbf"
+
+    async def read(self, version: int, z: int, x: int, y: int) -> Optional[bytes]:
+        return await to_thread.run_sync(self._read, self._path(version, z, x, y))
+
+    async def write(self, version: int, z: int, x: int, y: int, data: bytes) -> None:
+        await to_thread.run_sync(self._write, version, self._path(version, z, x, y), data)
+
+    @staticmethod
+    def _read(path: Path) -> Optional[bytes]:
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, version: int, path: Path, data: bytes) -> None:
+        if self._pruned_for != version:
+            self._prune(keep=version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и переименовываем — читатели не увидят
+        # недописанный тайл, параллельные записи одного тайла безопасны
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _prune(self, keep: int) -> None:
+        """Удаляет каталоги тайлов других версий."""
+        self._pruned_for = keep
+        if not self.root.is_dir():
+            return
+        for entry in self.root.iterdir():
+            if entry.is_dir() and entry.name != str(keep):
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+tile_cache = TileCache()
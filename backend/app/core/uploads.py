@@ -0,0 +1,550 @@
+"""
+Приём загружаемых изображений без блокировки event loop.
+
+Ограничения (переменные окружения):
+  UPLOAD_MAX_FILE_BYTES     — максимум на один файл (10 МиБ);
+  UPLOAD_MAX_REQUEST_BYTES  — максимум на тело запроса целиком (40 МиБ);
+  UPLOAD_MAX_FILES          — файлов в одном комментарии (10);
+  UPLOAD_CONCURRENCY        — сколько файлов запроса сохраняются параллельно (4).
+
+Лимит на запрос проверяет RequestSizeLimitMiddleware по мере чтения тела
+из сокета. Тело multipart разбирается потоково (receive_form, на
+колбэках python-multipart): каждая файловая часть сразу пишется и
+хэшируется в свой временный файл, а лимиты на файл и на число файлов
+проверяются на каждом пришедшем чанке — запрос обрывается с 413 на
+первом лишнем чанке, не дочитывая тело. Запись на диск идёт в пуле
+потоков. Комментарий без фото можно отправить и как
+application/x-www-form-urlencoded.
+
+Файлы хранятся по адресу содержимого: ключ 'ab/cd/<sha256>.<ext>' в
+хранилище (core.storage — локальный каталог или S3). Одинаковые фото
+хранятся один раз, а URL неизменяемы — их можно кэшировать как immutable.
+
+Вместо загрузки через API клиент может получить presigned URL
+(presign_upload) и отправить файл прямо в хранилище, а в комментарии
+передать только ключ (resolve_upload_keys). Миниатюры для такого файла
+строятся в фоне после создания комментария (build_missing_variants).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+from urllib.parse import parse_qsl
+
+import anyio
+from anyio import to_thread
+from fastapi import HTTPException, Request
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # pragma: no cover - python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from ..schemas import ImageVariants, UploadPresignResponse
+from .images import IMAGE_VARIANT_WIDTHS, build_variants, variant_key
+from .storage import IMMUTABLE_CACHE_CONTROL, LOCAL_STORAGE_DIR, get_storage
+
+# Временные файлы — на том же разделе, что и локальное хранилище, чтобы
+# публикация была простым rename
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", os.path.join(LOCAL_STORAGE_DIR, ".tmp"))
+
+UPLOAD_MAX_FILE_BYTES: int = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES: int = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(40 * 1024 * 1024)))
+UPLOAD_MAX_FILES: int = int(os.getenv("UPLOAD_MAX_FILES", "10"))
+UPLOAD_CONCURRENCY: int = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Обычные (не файловые) поля формы держатся в памяти
+UPLOAD_MAX_FIELD_BYTES = 64 * 1024
+# urlencoded-тело несёт только поля; процентное кодирование раздувает
+# кириллицу втрое
+UPLOAD_MAX_URLENCODED_BYTES = 4 * UPLOAD_MAX_FIELD_BYTES
+
+
+def _too_large(limit: int, what: str) -> HTTPException:
+    size = f"{limit // (1024 * 1024)} МиБ" if limit >= 1024 * 1024 else f"{limit // 1024} КиБ"
+    return HTTPException(status_code=413, detail=f"{what} больше {size}")
+
+
+_SAFE_EXT = re.compile(r"^\.[a-z0-9]{1,8}$")
+_SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+_CONTENT_KEY = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(\.[a-z0-9]{1,8})?$")
+
+
+def content_path(digest: str, ext: str) -> str:
+    """Ключ файла в хранилище: 'ab/cd/<sha256><ext>'."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def _safe_ext(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _SAFE_EXT.match(ext) else ""
+
+
+# ---------------------------------------------------------------------------
+# Потоковый разбор multipart
+# ---------------------------------------------------------------------------
+
+@dataclass
+class StagedUpload:
+    """Файловая часть запроса, уже записанная во временный файл."""
+    filename: str
+    content_type: Optional[str]
+    tmp_path: str
+    size: int = 0
+    sha256: str = ""
+
+
+@dataclass
+class MultipartForm:
+    fields: dict[str, list[str]] = field(default_factory=dict)
+    files: list[StagedUpload] = field(default_factory=list)
+
+    def get(self, name: str) -> Optional[str]:
+        values = self.fields.get(name)
+        return values[0] if values else None
+
+
+@dataclass
+class _Part:
+    name: str = ""
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    data: bytearray = field(default_factory=bytearray)
+
+
+def _append_chunk(f, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    f.write(chunk)
+
+
+class _MultipartReceiver:
+    """Колбэки для MultipartParser и запись файловых частей на диск.
+
+    Колбэки синхронные, поэтому файловые события они только складывают
+    в очередь; ввод-вывод делает feed() после каждого чанка тела.
+    """
+
+    def __init__(self, form: MultipartForm) -> None:
+        self.form = form
+        self.events: list[tuple] = []
+        self.part = _Part()
+        self.headers: dict[bytes, bytes] = {}
+        self.header_name = b""
+        self.header_value = b""
+        # текущий файл: (StagedUpload, открытый файл, sha256, буфер)
+        self.file: Optional[tuple] = None
+
+    # --- колбэки парсера ---------------------------------------------------
+
+    def on_part_begin(self) -> None:
+        self.part = _Part()
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self.header_name.lower()] = self.header_value
+        self.header_name = self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise HTTPException(status_code=422, detail="multipart: у части нет имени поля")
+        self.part.name = options[b"name"].decode("utf-8", "replace")
+        if options.get(b"filename"):
+            self.part.filename = options[b"filename"].decode("utf-8", "replace")
+            content_type = self.headers.get(b"content-type")
+            self.part.content_type = content_type.decode("latin-1") if content_type else None
+            self.events.append(("file_begin", self.part))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.part.filename is not None:
+            self.events.append(("file_data", data[start:end]))
+            return
+        if len(self.part.data) + (end - start) > UPLOAD_MAX_FIELD_BYTES:
+            raise _too_large(UPLOAD_MAX_FIELD_BYTES, f"Поле {self.part.name}")
+        self.part.data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self.part.filename is not None:
+            self.events.append(("file_end",))
+        else:
+            self.form.fields.setdefault(self.part.name, []).append(self.part.data.decode("utf-8", "replace"))
+
+    # --- файловый ввод-вывод -----------------------------------------------
+
+    async def feed(self) -> None:
+        events, self.events = self.events, []
+        for event in events:
+            if event[0] == "file_begin":
+                await self._begin(event[1])
+            elif event[0] == "file_data":
+                await self._data(event[1])
+            else:
+                await self._end()
+
+    async def _begin(self, part: _Part) -> None:
+        if len(self.form.files) >= UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Не больше {UPLOAD_MAX_FILES} файлов в комментарии")
+        staged = StagedUpload(
+            filename=part.filename,
+            content_type=part.content_type,
+            tmp_path=os.path.join(UPLOAD_TMP_DIR, f"{uuid.uuid4().hex}.part"),
+        )
+        # в form.files сразу — чтобы временный файл удалился и при ошибке
+        self.form.files.append(staged)
+        f = await to_thread.run_sync(open, staged.tmp_path, "wb")
+        self.file = (staged, f, hashlib.sha256(), bytearray())
+
+    async def _data(self, chunk: bytes) -> None:
+        staged, f, digest, buffer = self.file
+        staged.size += len(chunk)
+        if staged.size > UPLOAD_MAX_FILE_BYTES:
+            raise _too_large(UPLOAD_MAX_FILE_BYTES, "Файл")
+        buffer += chunk
+        # чанки тела мелкие (~64 КиБ) — на диск пишем крупнее
+        if len(buffer) >= UPLOAD_CHUNK_SIZE:
+            await to_thread.run_sync(_append_chunk, f, digest, bytes(buffer))
+            buffer.clear()
+
+    async def _end(self) -> None:
+        staged, f, digest, buffer = self.file
+        self.file = None
+        try:
+            if buffer:
+                await to_thread.run_sync(_append_chunk, f, digest, bytes(buffer))
+        finally:
+            await to_thread.run_sync(f.close)
+        staged.sha256 = digest.hexdigest()
+
+    async def close(self) -> None:
+        if self.file is not None:
+            await to_thread.run_sync(self.file[1].close)
+            self.file = None
+
+
+async def _read_urlencoded(request: Request) -> MultipartForm:
+    """Поля application/x-www-form-urlencoded (файлов в таком теле нет)."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > UPLOAD_MAX_URLENCODED_BYTES:
+            raise _too_large(UPLOAD_MAX_URLENCODED_BYTES, "Тело формы")
+    form = MultipartForm()
+    for name, value in parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True):
+        if len(value.encode()) > UPLOAD_MAX_FIELD_BYTES:
+            raise _too_large(UPLOAD_MAX_FIELD_BYTES, f"Поле {name}")
+        form.fields.setdefault(name, []).append(value)
+    return form
+
+
+@asynccontextmanager
+async def receive_form(request: Request) -> AsyncIterator[MultipartForm]:
+    """Потоково разбирает форму из тела запроса.
+
+    multipart/form-data: поля собираются в памяти (не больше
+    UPLOAD_MAX_FIELD_BYTES каждое), файлы — во временные файлы с sha256
+    содержимого. Больше UPLOAD_MAX_FILES файлов или файл больше
+    UPLOAD_MAX_FILE_BYTES — 413 сразу, без чтения остатка тела.
+    Временные файлы удаляются при выходе из контекста (сохранённые в
+    хранилище к этому моменту уже перемещены).
+
+    application/x-www-form-urlencoded — только поля, с теми же лимитами.
+    Другой Content-Type — 422.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type == b"application/x-www-form-urlencoded":
+        yield await _read_urlencoded(request)
+        return
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(
+            status_code=422,
+            detail="Ожидается multipart/form-data или application/x-www-form-urlencoded",
+        )
+
+    form = MultipartForm()
+    receiver = _MultipartReceiver(form)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": receiver.on_part_begin,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+    })
+    await anyio.Path(UPLOAD_TMP_DIR).mkdir(parents=True, exist_ok=True)
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await receiver.feed()
+            parser.finalize()
+            await receiver.feed()
+        finally:
+            await receiver.close()
+        yield form
+    finally:
+        for staged in form.files:
+            await anyio.Path(staged.tmp_path).unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------------------
+# Сохранение в хранилище
+# ---------------------------------------------------------------------------
+
+def _variant_keys(key: str) -> dict[str, str]:
+    return {variant: variant_key(key, width) for variant, width in IMAGE_VARIANT_WIDTHS.items()}
+
+
+async def _stored_variants(key: str) -> ImageVariants:
+    """Варианты уже сохранённого файла; отсутствующие заменяются оригиналом."""
+    storage = get_storage()
+    url = storage.url(key)
+    keys = _variant_keys(key)
+    present = await asyncio.gather(*(storage.exists(k) for k in keys.values()))
+    return ImageVariants(
+        original=url,
+        **{variant: storage.url(k) if ok else url for (variant, k), ok in zip(keys.items(), present)},
+    )
+
+
+async def _build_stored_variants(key: str) -> Optional[ImageVariants]:
+    """Строит недостающие варианты файла key из оригинала в хранилище.
+
+    None — варианты уже были или файл не декодируется.
+    """
+    storage = get_storage()
+    keys = _variant_keys(key)
+    present = await asyncio.gather(*(storage.exists(k) for k in keys.values()))
+    if all(present):
+        return None
+
+    await anyio.Path(UPLOAD_TMP_DIR).mkdir(parents=True, exist_ok=True)
+    tmp_prefix = os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex)
+    tmp_path = f"{tmp_prefix}.part"
+    variant_paths: dict[str, str] = {}
+    try:
+        await storage.get_file(key, tmp_path)
+        variant_paths = await build_variants(tmp_path, tmp_prefix)
+        await asyncio.gather(*(
+            storage.put_file(keys[variant], path, "image/webp")
+            for variant, path in variant_paths.items()
+        ))
+    finally:
+        for path in (tmp_path, *variant_paths.values()):
+            await anyio.Path(path).unlink(missing_ok=True)
+    if not variant_paths:
+        return None
+    return ImageVariants(original=storage.url(key), **{variant: storage.url(k) for variant, k in keys.items()})
+
+
+async def build_missing_variants(keys: list[str]) -> list[ImageVariants]:
+    """Строит варианты файлов, загруженных напрямую в хранилище.
+
+    Оригинал скачивается из хранилища, поэтому вызывается не на пути
+    запроса, а фоновой задачей после ответа (см. create_comment).
+    Возвращает варианты только тех файлов, для которых они построены;
+    не больше UPLOAD_CONCURRENCY файлов параллельно.
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def bounded(key: str) -> Optional[ImageVariants]:
+        async with semaphore:
+            return await _build_stored_variants(key)
+
+    built = await asyncio.gather(*(bounded(key) for key in keys))
+    return [v for v in built if v is not None]
+
+
+async def save_upload(staged: StagedUpload) -> ImageVariants:
+    """Сохраняет принятый файл в хранилище по адресу содержимого.
+
+    Ключ зависит только от sha256: повторная загрузка того же фото не
+    занимает место, а URL никогда не меняет содержимое. Для нового файла
+    в пуле процессов строятся миниатюра и веб-версия; они сохраняются
+    раньше оригинала, так что наличие оригинала означает, что варианты
+    уже на месте.
+    """
+    storage = get_storage()
+    key = content_path(staged.sha256, _safe_ext(staged.filename))
+    if await storage.exists(key):
+        return await _stored_variants(key)
+
+    tmp_prefix = staged.tmp_path.removesuffix(".part")
+    variant_paths: dict[str, str] = {}
+    try:
+        variant_paths = await build_variants(staged.tmp_path, tmp_prefix)
+        await asyncio.gather(*(
+            storage.put_file(variant_key(key, IMAGE_VARIANT_WIDTHS[variant]), path, "image/webp")
+            for variant, path in variant_paths.items()
+        ))
+        await storage.put_file(key, staged.tmp_path, staged.content_type)
+    finally:
+        # put_file забирает файл себе; всё, что осталось, — мусор после ошибки
+        for path in variant_paths.values():
+            await anyio.Path(path).unlink(missing_ok=True)
+
+    url = storage.url(key)
+    return ImageVariants(
+        original=url,
+        **{
+            variant: storage.url(variant_key(key, width)) if variant in variant_paths else url
+            for variant, width in IMAGE_VARIANT_WIDTHS.items()
+        },
+    )
+
+
+async def save_uploads(files: list[StagedUpload]) -> list[ImageVariants]:
+    """Сохраняет файлы запроса параллельно (не больше UPLOAD_CONCURRENCY).
+
+    Порядок результатов совпадает с порядком файлов. Уже сохранённые файлы
+    при ошибке в соседнем не удаляются: они адресуются по содержимому и
+    могут быть общими с другими комментариями.
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def bounded(staged: StagedUpload) -> ImageVariants:
+        async with semaphore:
+            return await save_upload(staged)
+
+    return list(await asyncio.gather(*(bounded(staged) for staged in files)))
+
+
+async def presign_upload(sha256: str, size: int, content_type: str, filename: str) -> UploadPresignResponse:
+    """Ключ и presigned URL для прямой загрузки файла в хранилище.
+
+    Подпись фиксирует размер и sha256, поэтому под ключом по адресу
+    содержимого окажется только файл с этим содержимым. Если файл уже
+    есть, upload = None. Локальное хранилище прямую загрузку не
+    поддерживает — 501.
+    """
+    sha256 = sha256.lower()
+    if not _SHA256_HEX.match(sha256):
+        raise HTTPException(status_code=422, detail="sha256 должен быть hex-строкой из 64 символов")
+    if size <= 0:
+        raise HTTPException(status_code=422, detail="Некорректный размер файла")
+    if size > UPLOAD_MAX_FILE_BYTES:
+        raise _too_large(UPLOAD_MAX_FILE_BYTES, "Файл")
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Можно загружать только изображения")
+
+    storage = get_storage()
+    key = content_path(sha256, _safe_ext(filename))
+    if await storage.exists(key):
+        return UploadPresignResponse(key=key, url=storage.url(key))
+    upload = await storage.presign_upload(key, size, sha256, content_type)
+    if upload is None:
+        raise HTTPException(status_code=501, detail="Хранилище не поддерживает прямую загрузку")
+    return UploadPresignResponse(
+        key=key,
+        url=storage.url(key),
+        upload={"url": upload.url, "method": upload.method, "headers": upload.headers},
+    )
+
+
+async def resolve_upload_keys(keys: list[str]) -> list[ImageVariants]:
+    """Проверяет ключи файлов, загруженных напрямую, и возвращает их варианты.
+
+    Ключ должен иметь вид адреса по содержимому и существовать в
+    хранилище, иначе 422. Байты файлов через API не проходят: если
+    миниатюры и веб-версии ещё нет, вариант указывает на оригинал, а
+    построить их можно позже (build_missing_variants).
+    """
+    storage = get_storage()
+    for key in keys:
+        if not _CONTENT_KEY.match(key):
+            raise HTTPException(status_code=422, detail=f"Некорректный ключ файла: {key}")
+    present = await asyncio.gather(*(storage.exists(key) for key in keys))
+    missing = [key for key, ok in zip(keys, present) if not ok]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Файлы не загружены в хранилище: {', '.join(missing)}")
+    return list(await asyncio.gather(*(_stored_variants(key) for key in keys)))
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles, отдающий файлы по адресу содержимого как immutable."""
+
+    _CONTENT_ADDRESSED = re.compile(r"(^|/)uploads/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}[^/]*$")
+
+    def file_response(self, full_path, *args, **kwargs) -> Response:
+        response = super().file_response(full_path, *args, **kwargs)
+        if self._CONTENT_ADDRESSED.search(str(full_path).replace(os.sep, "/")):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+class RequestSizeLimitMiddleware:
+    """ASGI-middleware: ограничивает размер тела запроса по мере чтения.
+
+    Запрос с Content-Length больше лимита отклоняется сразу, не читая
+    тело; для запросов без Content-Length (chunked) тело обрывается,
+    как только прочитано больше лимита.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI пропускает HTTPException из разбора тела как есть
+                    raise _too_large(self.max_bytes, "Запрос")
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send) -> None:
+        detail = _too_large(self.max_bytes, "Запрос").detail
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
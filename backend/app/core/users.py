@@ -0,0 +1,48 @@
+"""
+Кэш публичных профилей пользователей.
+
+Профиль (имя, email, аватар) меняется редко, а читается на каждый
+GET /api/auth/me. Профили держатся в процессе USER_PROFILE_TTL секунд;
+login/register кладут профиль в кэш сразу, так что /me после входа не
+ходит в БД. Изменить профиль через API нельзя; если это появится,
+старые данные будут отдаваться не дольше USER_PROFILE_TTL.
+"""
+import os
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import User as DBUser
+from ..schemas import User
+from .lru import LRUCache
+
+USER_PROFILE_CACHE_SIZE: int = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+USER_PROFILE_TTL: float = float(os.getenv("USER_PROFILE_TTL", "30"))
+
+_profiles: LRUCache[User] = LRUCache(USER_PROFILE_CACHE_SIZE, USER_PROFILE_TTL)
+
+
+def to_public_user(db_user: DBUser) -> User:
+    return User(
+        id=db_user.id,
+        username=db_user.username,
+        email=db_user.email,
+        avatarUrl=db_user.avatar_url,
+        createdAt=(db_user.created_at.isoformat() if db_user.created_at else ""),
+    )
+
+
+def remember_user_profile(user: User) -> None:
+    _profiles.set(user.id, user)
+
+
+async def get_user_profile(db: AsyncSession, user_id: int) -> Optional[User]:
+    """Профиль из кэша, при промахе — из БД. None — пользователя нет."""
+    user = _profiles.get(user_id)
+    if user is None:
+        db_user = await db.get(DBUser, user_id)
+        if db_user is None:
+            return None
+        user = to_public_user(db_user)
+        remember_user_profile(user)
+    return user
@@ -1,9 +1,24 @@
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from .routers import kremlins, auth
+from .core import images, passwords
+from .core.pool import pool_stats
+from .core.uploads import RequestSizeLimitMiddleware, UploadStaticFiles
+from .database import async_engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # снимок списка и индекс автодополнения — до первого запроса
+    await kremlins.warm_caches()
+    yield
+    images.shutdown_executor()
+    passwords.shutdown_executor()
+
 
 app = FastAPI(
     title="Кремли России API",
@@ -14,14 +29,21 @@ app = FastAPI(
         "менять только реализацию внутри роутеров."
     ),
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Лимит размера тела запроса проверяется при чтении из сокета, до разбора multipart.
+# Добавляется раньше CORS, чтобы ответ 413 тоже получил CORS-заголовки.
+app.add_middleware(RequestSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origin_regex=r"http://localhost(:\d+)?",
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # заголовки постраничного ответа GET /api/kremlins
+    expose_headers=["X-Next-Cursor", "X-Result-Truncated"],
 )
 
 # ---------------------------------------------------------------------------
@@ -31,10 +53,19 @@ app.add_middleware(
 app.include_router(kremlins.router)
 app.include_router(auth.router)
 
-# Статические файлы (загруженные изображения)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статические файлы (загруженные изображения; файлы по адресу содержимого — immutable)
+app.mount("/static", UploadStaticFiles(directory="static"), name="static")
 
 
 @app.get("/", include_in_schema=False)
 def root():
     return {"message": "Кремли России API. Документация: /docs"}
+
+
+@app.get("/api/health/db", include_in_schema=False)
+def db_health():
+    """Состояние пула соединений с БД (занятые, overflow, ожидание) и очередь хэширования паролей."""
+    return {
+        "pool": pool_stats(async_engine),
+        "passwordHashPending": passwords.pending(),
+    }
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import Column, Computed, Integer, BigInteger, String, Text, Boolean, ForeignKey, DateTime, DDL, Index, event, text
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR
 from sqlalchemy.sql import func
 from geoalchemy2 import Geometry
 from .database import Base
@@ -17,6 +17,15 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# Вес A — название, B — город, C — описание; конфигурация russian
+# (стемминг: «кремля», «кремлём» -> «кремл»)
+FORTRESS_SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+)
+
+
 class Fortress(Base):
     __tablename__ = "fortresses"
     id = Column(Integer, primary_key=True, index=True)
@@ -30,7 +39,32 @@ class Fortress(Base):
     # Дополнительные поля, которые могут понадобиться фронтенду
     city = Column(String, nullable=True)
     wikipedia_url = Column(String, nullable=True)
+    # ключ синхронизации с Wikidata (load_kremlins_sql.py --mode upsert)
     wikidata_id = Column(String, nullable=True)
+    # мягкое удаление: объект пропал из Wikidata, но комментарии к нему остаются
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # полнотекстовый поиск (GET /api/kremlins/search): вычисляется самой БД
+    search_vector = Column(TSVECTOR, Computed(FORTRESS_SEARCH_VECTOR, persisted=True))
+
+
+# Уникальный ключ для INSERT ... ON CONFLICT (wikidata_id) при синхронизации
+Index("ux_fortresses_wikidata_id", Fortress.wikidata_id, unique=True)
+
+# Поиск: GIN по tsvector и триграммный GIN по названию (опечатки, pg_trgm)
+Index("ix_fortresses_search_vector", Fortress.search_vector, postgresql_using="gin")
+Index(
+    "ix_fortresses_name_trgm", Fortress.name,
+    postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+)
+event.listen(Fortress.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+# Фильтры и keyset-пагинация списка (GET /api/kremlins?city=...&sort=...):
+# частичные индексы — в запросах списка всегда есть deleted_at IS NULL
+_LIVE_FORTRESSES = text("deleted_at IS NULL")
+Index("ix_fortresses_city_id", func.lower(Fortress.city), Fortress.id, postgresql_where=_LIVE_FORTRESSES)
+Index("ix_fortresses_style_id", func.lower(Fortress.architectural_style), Fortress.id, postgresql_where=_LIVE_FORTRESSES)
+Index("ix_fortresses_year_id", Fortress.foundation_year, Fortress.id, postgresql_where=_LIVE_FORTRESSES)
+Index("ix_fortresses_name_id", Fortress.name, Fortress.id, postgresql_where=_LIVE_FORTRESSES)
 
 
 class Comment(Base):
@@ -42,9 +76,75 @@ class Comment(Base):
     author_avatar_url = Column(String, nullable=True)
     text = Column(Text, nullable=False)
     image_urls = Column(JSON, nullable=False, server_default='[]')
+    # [{original, thumb, medium}, ...] — по одному элементу на image_urls
+    image_variants = Column(JSON, nullable=False, server_default='[]')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     fortress = relationship("Fortress", backref="comments")
 
 
+# Keyset-пагинация комментариев кремля: WHERE kremlin_id = ? AND
+# (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+Index(
+    "ix_comments_kremlin_created_id",
+    Comment.kremlin_id, Comment.created_at.desc(), Comment.id.desc(),
+)
+
+
+class DatasetVersion(Base):
+    """Версия набора данных (например, "fortresses").
+
+    Увеличивается триггером на любую запись в таблицу, по ней
+    инвалидируются in-process кэши (снимок списка кремлей и т.п.).
+    """
+    __tablename__ = "dataset_versions"
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 # Совместимость: в других модулях ожидается имя "Kremlin"
 Kremlin = Fortress
+
+
+# ---------------------------------------------------------------------------
+# Триггеры версии набора данных
+# ---------------------------------------------------------------------------
+# Те же объекты создаёт миграция alembic; здесь они нужны для
+# Base.metadata.create_all() в скриптах загрузки.
+#
+# Версия — монотонная метка времени в мс (а не просто +1), чтобы после
+# пересоздания таблицы dataset_versions она не совпала со старой версией,
+# закэшированной в работающих процессах.
+
+BUMP_DATASET_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_dataset_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO dataset_versions (name, version, updated_at)
+    VALUES (TG_TABLE_NAME, (extract(epoch FROM clock_timestamp()) * 1000)::bigint, now())
+    ON CONFLICT (name) DO UPDATE SET
+        version = GREATEST(dataset_versions.version + 1, EXCLUDED.version),
+        updated_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Колонки, изменение которых видно клиентам; comments_count сюда не входит,
+# чтобы новый комментарий не сбрасывал кэш списка
+FORTRESS_VERSIONED_COLUMNS = (
+    "name, location, description, foundation_year, architectural_style, "
+    "image_url, city, wikipedia_url, wikidata_id, deleted_at"
+)
+
+FORTRESS_VERSION_TRIGGERS = (
+    "CREATE TRIGGER fortresses_dataset_version_iud "
+    "AFTER INSERT OR DELETE OR TRUNCATE ON fortresses "
+    "FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();",
+    f"CREATE TRIGGER fortresses_dataset_version_upd "
+    f"AFTER UPDATE OF {FORTRESS_VERSIONED_COLUMNS} ON fortresses "
+    f"FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();",
+)
+
+event.listen(Fortress.__table__, "after_create", DDL(BUMP_DATASET_VERSION_FUNCTION))
+for _trigger in FORTRESS_VERSION_TRIGGERS:
+    event.listen(Fortress.__table__, "after_create", DDL(_trigger))
@@ -1,20 +1,34 @@
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Form, UploadFile, File, Header, Depends
-from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Header, Depends, Query, Request, Response
+from typing import Any, Callable, Optional, Union
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
 
+import asyncio
+import base64
+import difflib
+import json
+import logging
+import math
 import os
-import shutil
-import uuid
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 
-from ..schemas import KremlinListItem, KremlinDetail, KremlinLocation, Comment
+from ..schemas import KremlinListItem, KremlinDetail, KremlinBatch, KremlinBatchRequest, KremlinLocation, KremlinCluster, KremlinNearby, KremlinSearchResult, Comment, CommentPage, UploadPresignRequest, UploadPresignResponse
 from ..core import security
-from ..database import engine
-from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
+from ..core.dataset import get_dataset_version
+from ..core.prerender import PrerenderedBody
+from ..core.snapshot import SnapshotCache, etag_matches
+from ..core.suggest import SuggestIndex
+from ..core.tiles import tile_cache
+from ..core.images import external_variants
+from ..core.uploads import receive_form, save_uploads, presign_upload, resolve_upload_keys, build_missing_variants, UPLOAD_MAX_FILE_BYTES, UPLOAD_MAX_REQUEST_BYTES, UPLOAD_MAX_FILES
+from ..database import async_engine, AsyncSessionLocal, DB_ERRORS
+from sqlalchemy import text, select, update, func, tuple_
 
 router = APIRouter(prefix="/api/kremlins", tags=["kremlins"])
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Хардкодные данные (mock)
@@ -254,12 +268,844 @@ def _require_auth(authorization: Optional[str]) -> dict:
         raise HTTPException(status_code=401, detail="Не авторизован")
     token = authorization.split(" ", 1)[1]
     try:
-        payload = security.decode_access_token(token)
+        # проверенные токены кэшируются: повторные запросы не считают HMAC
+        payload = security.verify_access_token(token)
     except Exception:
         raise HTTPException(status_code=401, detail="Не авторизован")
     return payload
 
 
+# ---------------------------------------------------------------------------
+# Снимок списка кремлей
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class KremlinListSnapshot:
+    """Готовый список для GET /api/kremlins, собранный для одной версии данных.
+
+    body — уже сериализованный JSON (и его gzip/brotli варианты), так что
+    валидация response_model и json-сериализация выполняются один раз
+    на версию, а не на каждый запрос.
+    """
+    version: Optional[int]
+    items: list[KremlinListItem]
+    body: PrerenderedBody
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.body.etag
+
+
+_list_adapter = TypeAdapter(list[KremlinListItem])
+
+
+def _make_list_snapshot(version: Optional[int], items: list[KremlinListItem], etag: Optional[str]) -> KremlinListSnapshot:
+    body = PrerenderedBody.render(_list_adapter.dump_json(items), etag=etag)
+    return KremlinListSnapshot(version=version, items=items, body=body)
+
+
+_list_cache: SnapshotCache[KremlinListSnapshot] = SnapshotCache()
+
+_MOCK_LIST_SNAPSHOT = _make_list_snapshot(
+    None,
+    [KremlinListItem(**k.model_dump()) for k in KREMLINS_DATA],
+    '"kremlins-mock"',
+)
+
+
+_LIST_COLUMNS = "id, name, ST_X(location) AS lon, ST_Y(location) AS lat, image_url, foundation_year, city"
+
+
+def _row_to_list_item(row) -> Optional[KremlinListItem]:
+    """Строка fortresses (lon/lat уже извлечены) -> KremlinListItem; None без координат."""
+    lat = row.get("lat")
+    lon = row.get("lon")
+    if lat is None or lon is None:
+        return None
+    return KremlinListItem(
+        id=row["id"],
+        name=row["name"],
+        location=KremlinLocation(lat=lat, lon=lon),
+        previewImageUrl=row.get("image_url"),
+        city=row.get("city"),
+        yearBuilt=row.get("foundation_year"),
+    )
+
+
+def _prerendered_response(
+    body: PrerenderedBody,
+    if_none_match: Optional[str],
+    accept_encoding: Optional[str],
+) -> Response:
+    """Ответ из готовых байтов: 304 по ETag или тело в подходящей кодировке."""
+    content, encoding, etag = body.pick(accept_encoding)
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+async def _build_list_snapshot(version: Optional[int]) -> KremlinListSnapshot:
+    async with async_engine.connect() as conn:
+        res = await conn.execute(text(f"SELECT {_LIST_COLUMNS} FROM fortresses WHERE deleted_at IS NULL"))
+        items = [item for item in map(_row_to_list_item, res.mappings()) if item is not None]
+    etag = f'"kremlins-{version}"' if version is not None else None
+    # Сериализация и сжатие — CPU-работа, не держим на ней event loop
+    return await run_in_threadpool(_make_list_snapshot, version, items, etag)
+
+
+# ---------------------------------------------------------------------------
+# Выборка по области карты (bbox)
+# ---------------------------------------------------------------------------
+
+# Верхняя граница размера ответа для запросов с фильтрами
+LIST_MAX_LIMIT = 10000
+
+
+@dataclass(frozen=True)
+class BBox:
+    """Прямоугольник карты в WGS-84. min_lon > max_lon — пересечение антимеридиана."""
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+
+    def envelopes(self) -> list[tuple[float, float, float, float]]:
+        if self.min_lon <= self.max_lon:
+            return [(self.min_lon, self.min_lat, self.max_lon, self.max_lat)]
+        return [
+            (self.min_lon, self.min_lat, 180.0, self.max_lat),
+            (-180.0, self.min_lat, self.max_lon, self.max_lat),
+        ]
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return any(
+            x1 <= lon <= x2 and y1 <= lat <= y2
+            for x1, y1, x2, y2 in self.envelopes()
+        )
+
+    def to_sql(self, params: dict, column: str = "location") -> str:
+        """Условие `column && ST_MakeEnvelope(...)` (использует GiST-индекс)."""
+        parts = []
+        for i, (x1, y1, x2, y2) in enumerate(self.envelopes()):
+            params.update({f"bb{i}_x1": x1, f"bb{i}_y1": y1, f"bb{i}_x2": x2, f"bb{i}_y2": y2})
+            parts.append(f"{column} && ST_MakeEnvelope(:bb{i}_x1, :bb{i}_y1, :bb{i}_x2, :bb{i}_y2, 4326)")
+        return "(" + " OR ".join(parts) + ")"
+
+
+def _parse_bbox(raw: str) -> BBox:
+    """'minLon,minLat,maxLon,maxLat' -> BBox или 422."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in raw.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox: ожидается minLon,minLat,maxLon,maxLat")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise HTTPException(status_code=422, detail="bbox: координаты вне допустимого диапазона")
+    return BBox(min_lon, min_lat, max_lon, max_lat)
+
+
+# ---------------------------------------------------------------------------
+# Фильтры, сортировка и keyset-пагинация списка
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class ListSort:
+    """Порядок списка: колонка fortresses (+ id для однозначности) и направление.
+
+    Как и в Postgres, NULL считается больше любого значения: при
+    возрастании такие строки идут в конце, при убывании — в начале.
+    Так порядок совпадает с порядком индексов (column, id) в обе стороны.
+    """
+    column: Optional[str]  # None — сортировка только по id
+    field: Optional[str]   # то же поле в KremlinListItem (для курсора и mock)
+    descending: bool = False
+
+    @property
+    def value_type(self) -> Optional[type]:
+        return {"name": str, "yearBuilt": int}.get(self.field)
+
+    def order_sql(self) -> str:
+        direction = "DESC" if self.descending else "ASC"
+        if self.column is None:
+            return f"id {direction}"
+        return f"{self.column} {direction}, id {direction}"
+
+    def after_sql(self, value, last_id: int, params: dict) -> str:
+        """Условие «строго после позиции (value, last_id)» в этом порядке."""
+        op = "<" if self.descending else ">"
+        params["after_id"] = last_id
+        if self.column is None:
+            return f"id {op} :after_id"
+        if value is None:
+            # позиция внутри NULL-хвоста (или NULL-головы при убывании)
+            rest = f" OR {self.column} IS NOT NULL" if self.descending else ""
+            return f"(({self.column} IS NULL AND id {op} :after_id){rest})"
+        params["after_value"] = value
+        rest = "" if self.descending else f" OR {self.column} IS NULL"
+        return f"(({self.column}, id) {op} (:after_value, :after_id){rest})"
+
+    def position(self, item: KremlinListItem) -> tuple:
+        value = getattr(item, self.field) if self.field else None
+        return (value, item.id)
+
+    def row_position(self, row) -> tuple:
+        return (row[self.column] if self.column else None, row["id"])
+
+    def sort_key(self, value, item_id: int) -> tuple:
+        """Ключ для сортировки в памяти с тем же местом NULL, что и в БД."""
+        return (1, 0, item_id) if value is None else (0, value, item_id)
+
+
+LIST_SORTS: dict[str, ListSort] = {
+    "id": ListSort(None, None),
+    "-id": ListSort(None, None, descending=True),
+    "name": ListSort("name", "name"),
+    "-name": ListSort("name", "name", descending=True),
+    "yearBuilt": ListSort("foundation_year", "yearBuilt"),
+    "-yearBuilt": ListSort("foundation_year", "yearBuilt", descending=True),
+}
+
+
+# Заглушка, которую загрузчик (load_kremlins_sql.py) пишет в image_url,
+# если у кремля нет фото в Wikidata; для hasImage это «без фото»
+PLACEHOLDER_IMAGE_PREFIX = "https://placehold.co/"
+
+
+def _has_image(url: Optional[str]) -> bool:
+    return bool(url) and not url.startswith(PLACEHOLDER_IMAGE_PREFIX)
+
+
+@dataclass(frozen=True)
+class ListFilters:
+    """Фильтры GET /api/kremlins; строковые сравниваются без учёта регистра."""
+    city: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    architectural_style: Optional[str] = None
+    has_image: Optional[bool] = None
+
+    def is_empty(self) -> bool:
+        return self == ListFilters()
+
+    def to_sql(self, params: dict) -> list[str]:
+        """Условия WHERE; lower(...) совпадает с выражениями индексов ix_fortresses_*_id."""
+        where = []
+        if self.city is not None:
+            where.append("lower(city) = lower(:city)")
+            params["city"] = self.city
+        if self.year_from is not None:
+            where.append("foundation_year >= :year_from")
+            params["year_from"] = self.year_from
+        if self.year_to is not None:
+            where.append("foundation_year <= :year_to")
+            params["year_to"] = self.year_to
+        if self.architectural_style is not None:
+            where.append("lower(architectural_style) = lower(:style)")
+            params["style"] = self.architectural_style
+        if self.has_image is not None:
+            params["placeholder_image"] = PLACEHOLDER_IMAGE_PREFIX + "%"
+        if self.has_image is True:
+            where.append("(coalesce(image_url, '') <> '' AND image_url NOT LIKE :placeholder_image)")
+        elif self.has_image is False:
+            where.append("(coalesce(image_url, '') = '' OR image_url LIKE :placeholder_image)")
+        return where
+
+    def matches(self, item: KremlinListItem) -> bool:
+        """То же для mock-данных (в них нет архитектурного стиля)."""
+        if self.city is not None and (item.city or "").casefold() != self.city.casefold():
+            return False
+        if self.year_from is not None and (item.yearBuilt is None or item.yearBuilt < self.year_from):
+            return False
+        if self.year_to is not None and (item.yearBuilt is None or item.yearBuilt > self.year_to):
+            return False
+        if self.architectural_style is not None:
+            return False
+        if self.has_image is not None and _has_image(item.previewImageUrl) != self.has_image:
+            return False
+        return True
+
+
+def _encode_list_cursor(sort: str, value, last_id: int) -> str:
+    """Курсор — порядок и позиция последней карточки страницы."""
+    raw = json.dumps([sort, value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_list_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Некорректный cursor")
+    expected = LIST_SORTS[sort].value_type
+    if cursor_sort != sort:
+        raise HTTPException(status_code=422, detail="cursor выдан для другого sort")
+    if not isinstance(last_id, int) or (value is not None and (expected is None or type(value) is not expected)):
+        raise HTTPException(status_code=422, detail="Некорректный cursor")
+    return value, last_id
+
+
+async def _query_list_rows(
+    where: list[str],
+    params: dict,
+    limit: int,
+    sort: ListSort = LIST_SORTS["id"],
+    columns: str = _LIST_COLUMNS,
+) -> tuple[list, bool]:
+    """SELECT строк fortresses по условиям; возвращает (rows, есть ли записи после limit)."""
+    # мягко удалённые при синхронизации кремли не показываются, кремли без
+    # координат — тоже (как и в снимке), иначе страница была бы короче limit
+    conditions = ["deleted_at IS NULL", "location IS NOT NULL", *where]
+    sql = f"SELECT {columns} FROM fortresses WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {sort.order_sql()} LIMIT :limit"
+    async with async_engine.connect() as conn:
+        res = await conn.execute(text(sql), {**params, "limit": limit + 1})
+        rows = res.mappings().all()
+    return rows[:limit], len(rows) > limit
+
+
+async def _query_list_items(
+    where: list[str],
+    params: dict,
+    limit: int,
+    sort: ListSort = LIST_SORTS["id"],
+) -> tuple[list[KremlinListItem], bool]:
+    """То же, но сразу карточками KremlinListItem."""
+    rows, more = await _query_list_rows(where, params, limit, sort)
+    return [item for item in map(_row_to_list_item, rows) if item is not None], more
+
+
+def _list_in_memory(
+    items: list[KremlinListItem],
+    filters: ListFilters,
+    sort: ListSort,
+    after: Optional[tuple],
+    limit: int,
+) -> tuple[list[KremlinListItem], bool]:
+    """Та же выборка по списку в памяти (mock)."""
+    def key(item: KremlinListItem) -> tuple:
+        return sort.sort_key(*sort.position(item))
+
+    ordered = sorted((k for k in items if filters.matches(k)), key=key, reverse=sort.descending)
+    if after is not None:
+        bound = sort.sort_key(*after)
+        ordered = [k for k in ordered if (key(k) < bound if sort.descending else key(k) > bound)]
+    return ordered[:limit], len(ordered) > limit
+
+
+def _list_response(body: bytes, truncated: bool, next_cursor: Optional[str] = None) -> Response:
+    headers = {}
+    if truncated:
+        headers["X-Result-Truncated"] = "true"
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ---------------------------------------------------------------------------
+# Выборочные поля ответа (?fields=)
+# ---------------------------------------------------------------------------
+
+# Поле ответа -> выражения SELECT, нужные для него
+_LIST_FIELD_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "name": ("name",),
+    "location": ("ST_X(location) AS lon", "ST_Y(location) AS lat"),
+    "previewImageUrl": ("image_url",),
+    "city": ("city",),
+    "yearBuilt": ("foundation_year",),
+}
+_DETAIL_FIELD_COLUMNS: dict[str, tuple[str, ...]] = {
+    **_LIST_FIELD_COLUMNS,
+    "description": ("description",),
+    "wikipediaUrl": ("wikipedia_url",),
+    "wikidataId": ("wikidata_id",),
+    "images": ("image_url",),
+    "imageVariants": ("image_url",),
+    "commentsCount": ("comments_count",),
+}
+
+
+def _row_images(row) -> list[str]:
+    return [row["image_url"]] if row["image_url"] else []
+
+
+# Поле ответа -> его значение из строки, выбранной по _DETAIL_FIELD_COLUMNS
+_ROW_FIELDS: dict[str, Callable[[Any], Any]] = {
+    "id": lambda row: row["id"],
+    "name": lambda row: row["name"],
+    # как и в полном ответе деталей, кремль без координат — (0, 0)
+    "location": lambda row: {"lat": row["lat"] or 0.0, "lon": row["lon"] or 0.0},
+    "previewImageUrl": lambda row: row["image_url"],
+    "city": lambda row: row["city"],
+    "yearBuilt": lambda row: row["foundation_year"],
+    "description": lambda row: row["description"],
+    "wikipediaUrl": lambda row: row["wikipedia_url"],
+    "wikidataId": lambda row: row["wikidata_id"],
+    "images": _row_images,
+    "imageVariants": lambda row: [external_variants(u).model_dump() for u in _row_images(row)],
+    "commentsCount": lambda row: row["comments_count"] or 0,
+}
+
+_sparse_adapter = TypeAdapter(dict[str, Any])
+_sparse_list_adapter = TypeAdapter(list[dict[str, Any]])
+
+# Выборочные тела несортированного списка для текущей версии данных:
+# набор полей -> тело. Наборов не больше 2^5 (id входит всегда).
+_sparse_list_cache: SnapshotCache[dict[tuple[str, ...], PrerenderedBody]] = SnapshotCache()
+
+
+def _parse_fields(raw: Optional[str], allowed: dict[str, tuple[str, ...]]) -> Optional[tuple[str, ...]]:
+    """'name,location' -> ('id', 'name', 'location') в порядке схемы; None — все поля.
+
+    id возвращается всегда; неизвестное поле — 422.
+    """
+    if raw is None:
+        return None
+    requested = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = requested - allowed.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"fields: неизвестные поля {', '.join(sorted(unknown))}; допустимы: {', '.join(allowed)}",
+        )
+    requested.add("id")
+    return tuple(f for f in allowed if f in requested)
+
+
+def _select_columns(fields: tuple[str, ...], allowed: dict[str, tuple[str, ...]]) -> str:
+    return ", ".join(dict.fromkeys(column for f in fields for column in allowed[f]))
+
+
+def _row_to_fields(row, fields: tuple[str, ...]) -> dict[str, Any]:
+    return {f: _ROW_FIELDS[f](row) for f in fields}
+
+
+def _dump_list(items: list[KremlinListItem], fields: Optional[tuple[str, ...]]) -> bytes:
+    if fields is None:
+        return _list_adapter.dump_json(items)
+    return _list_adapter.dump_json(items, include={"__all__": set(fields)})
+
+
+async def _empty_fieldsets() -> dict[tuple[str, ...], PrerenderedBody]:
+    return {}
+
+
+async def _sparse_list_body(snapshot: KremlinListSnapshot, fields: tuple[str, ...]) -> PrerenderedBody:
+    """Тело списка из снимка, сокращённое до fields; собирается раз на версию и набор полей."""
+    bodies = await _sparse_list_cache.get(snapshot.version, _empty_fieldsets)
+    body = bodies.get(fields)
+    if body is None:
+        etag = f'{snapshot.etag[:-1]}-{"+".join(fields)}"' if snapshot.etag else None
+        body = bodies[fields] = await run_in_threadpool(
+            lambda: PrerenderedBody.render(_dump_list(snapshot.items, fields), etag=etag)
+        )
+    return body
+
+
+# ---------------------------------------------------------------------------
+# Детали кремля (одного и пакетом)
+# ---------------------------------------------------------------------------
+
+# Не больше стольких id за один пакетный запрос
+BATCH_MAX_IDS = 500
+
+_DETAIL_COLUMNS = _select_columns(tuple(_DETAIL_FIELD_COLUMNS), _DETAIL_FIELD_COLUMNS)
+
+
+def _row_to_detail(row) -> KremlinDetail:
+    """Строка fortresses (по _DETAIL_COLUMNS) -> KremlinDetail."""
+    return KremlinDetail.model_validate(_row_to_fields(row, tuple(_DETAIL_FIELD_COLUMNS)))
+
+
+def _mock_detail(kremlin_id: int) -> Optional[KremlinDetail]:
+    kremlin = _KREMLINS_BY_ID.get(kremlin_id)
+    if kremlin is None:
+        return None
+    return kremlin.model_copy(update={"imageVariants": [external_variants(u) for u in kremlin.images]})
+
+
+def _parse_ids(raw: str) -> list[int]:
+    """'3,1,2' -> [3, 1, 2] или 422."""
+    try:
+        return [int(v) for v in raw.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids: ожидаются целые числа через запятую")
+
+
+async def _batch_response(ids: list[int], fields: Optional[str]) -> Response:
+    """Детали всех ids одним запросом `WHERE id = ANY(:ids)`, в порядке запроса.
+
+    Повторы id отдаются один раз; отсутствующие (или удалённые) — в missing.
+    """
+    selected = _parse_fields(fields, _DETAIL_FIELD_COLUMNS)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=422, detail="ids: нужен хотя бы один id")
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=422, detail=f"ids: не больше {BATCH_MAX_IDS} за запрос")
+
+    found: dict[int, Any] = {}
+    try:
+        columns = _DETAIL_COLUMNS if selected is None else _select_columns(selected, _DETAIL_FIELD_COLUMNS)
+        q = text(f"SELECT {columns} FROM fortresses WHERE id = ANY(:ids) AND deleted_at IS NULL")
+        async with async_engine.connect() as conn:
+            res = await conn.execute(q, {"ids": ids})
+            rows = {row["id"]: row for row in res.mappings()}
+        for kremlin_id, row in rows.items():
+            found[kremlin_id] = _row_to_detail(row) if selected is None else _row_to_fields(row, selected)
+    except DB_ERRORS:
+        for kremlin_id in ids:
+            kremlin = _mock_detail(kremlin_id)
+            if kremlin is not None:
+                found[kremlin_id] = kremlin if selected is None else kremlin.model_dump(include=set(selected))
+
+    items = [found[i] for i in ids if i in found]
+    missing = [i for i in ids if i not in found]
+    if selected is None:
+        body = KremlinBatch(items=items, missing=missing).model_dump_json()
+    else:
+        body = _sparse_adapter.dump_json({"items": items, "missing": missing})
+    return Response(content=body, media_type="application/json")
+
+
+# ---------------------------------------------------------------------------
+# Кластеризация маркеров
+# ---------------------------------------------------------------------------
+
+# Размер ячейки сетки кластеров в пикселях экрана (тайлы 256px)
+CLUSTER_CELL_PX = int(os.getenv("CLUSTER_CELL_PX", "60"))
+# Начиная с этого зума кластеризация почти ничего не объединяет —
+# более крупные зумы считаются по этому уровню
+CLUSTER_MAX_ZOOM = 16
+
+_cluster_adapter = TypeAdapter(list[KremlinCluster])
+
+# Пирамида кластеров: для текущей версии данных — zoom -> кластеры всего мира.
+# Уровни считаются лениво, при первом запросе соответствующего зума.
+_cluster_cache: SnapshotCache[dict[int, list[KremlinCluster]]] = SnapshotCache()
+
+
+def _cluster_cell(zoom: int) -> float:
+    """Размер ячейки сетки в градусах для зума zoom."""
+    return 360.0 * CLUSTER_CELL_PX / (256 * 2 ** zoom)
+
+
+def _make_cluster(count: int, lat: float, lon: float, single_id: Optional[int], bounds: list[float]) -> KremlinCluster:
+    return KremlinCluster(
+        count=count,
+        location=KremlinLocation(lat=lat, lon=lon),
+        kremlinId=single_id if count == 1 else None,
+        bounds=bounds if count > 1 else None,
+    )
+
+
+async def _query_clusters(zoom: int) -> list[KremlinCluster]:
+    """Кластеры всего набора на зуме zoom: ST_SnapToGrid + агрегаты в БД."""
+    q = text("""
+        SELECT count(*) AS count,
+               ST_X(ST_Centroid(ST_Collect(location))) AS lon,
+               ST_Y(ST_Centroid(ST_Collect(location))) AS lat,
+               min(id) AS min_id,
+               ST_XMin(ST_Extent(location)) AS x1, ST_YMin(ST_Extent(location)) AS y1,
+               ST_XMax(ST_Extent(location)) AS x2, ST_YMax(ST_Extent(location)) AS y2
+        FROM fortresses
+        WHERE location IS NOT NULL AND deleted_at IS NULL
+        GROUP BY ST_SnapToGrid(location, :cell)
+    """)
+    async with async_engine.connect() as conn:
+        res = await conn.execute(q, {"cell": _cluster_cell(zoom)})
+        return [
+            _make_cluster(r["count"], r["lat"], r["lon"], r["min_id"], [r["x1"], r["y1"], r["x2"], r["y2"]])
+            for r in res.mappings()
+        ]
+
+
+def _cluster_in_memory(items: list[KremlinListItem], zoom: int) -> list[KremlinCluster]:
+    """То же, что _query_clusters, но по списку в памяти (для mock-данных)."""
+    cell = _cluster_cell(zoom)
+    groups: dict[tuple[int, int], list[KremlinListItem]] = {}
+    for k in items:
+        key = (round(k.location.lon / cell), round(k.location.lat / cell))
+        groups.setdefault(key, []).append(k)
+    clusters = []
+    for group in groups.values():
+        lons = [k.location.lon for k in group]
+        lats = [k.location.lat for k in group]
+        clusters.append(_make_cluster(
+            len(group), sum(lats) / len(lats), sum(lons) / len(lons),
+            min(k.id for k in group), [min(lons), min(lats), max(lons), max(lats)],
+        ))
+    return clusters
+
+
+async def _empty_pyramid() -> dict[int, list[KremlinCluster]]:
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# Ближайшие кремли (KNN)
+# ---------------------------------------------------------------------------
+
+NEAREST_MAX_K = 100
+# Оператор <-> упорядочивает по планарному расстоянию в градусах; на
+# высоких широтах это не совпадает с расстоянием по поверхности, поэтому
+# берём с запасом кандидатов по индексу и досортировываем по geography
+KNN_OVERFETCH = 4
+EARTH_RADIUS_KM = 6371.0088
+
+_nearby_adapter = TypeAdapter(list[KremlinNearby])
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def _row_to_nearby(row) -> Optional[KremlinNearby]:
+    item = _row_to_list_item(row)
+    if item is None:
+        return None
+    return KremlinNearby(**item.model_dump(), distanceKm=round(row["distance_km"], 3))
+
+
+async def _query_nearest(ref_sql: str, params: dict, k: int, radius_km: Optional[float]) -> list[KremlinNearby]:
+    """k ближайших к точке ref_sql (SQL-выражение geometry 4326).
+
+    Внутренний запрос — KNN по GiST-индексу (ORDER BY location <-> ref),
+    внешний — точная сортировка по расстоянию на сфероиде.
+    """
+    where = ["f.location IS NOT NULL", "f.deleted_at IS NULL"]
+    if "exclude_id" in params:
+        where.append("f.id <> :exclude_id")
+    if radius_km is not None:
+        # Грубый прямоугольник по индексу, затем точная проверка по geography
+        where.append(
+            "f.location && ST_Expand(ref.geom, :radius_km / (111.32 * "
+            "greatest(cos(radians(least(abs(ST_Y(ref.geom)) + :radius_km / 111.32, 89.9))), 0.01)))"
+        )
+        where.append("ST_DWithin(f.location::geography, ref.geom::geography, :radius_km * 1000)")
+        params = {**params, "radius_km": radius_km}
+    q = text(f"""
+        WITH ref AS (SELECT {ref_sql} AS geom)
+        SELECT * FROM (
+            SELECT {_LIST_COLUMNS},
+                   ST_Distance(f.location::geography, ref.geom::geography) / 1000 AS distance_km
+            FROM fortresses f, ref
+            WHERE {" AND ".join(where)}
+            ORDER BY f.location <-> ref.geom
+            LIMIT :candidates
+        ) c
+        ORDER BY distance_km, id
+        LIMIT :k
+    """)
+    async with async_engine.connect() as conn:
+        res = await conn.execute(q, {**params, "k": k, "candidates": k * KNN_OVERFETCH})
+        return [item for item in map(_row_to_nearby, res.mappings()) if item is not None]
+
+
+def _nearest_in_memory(
+    lat: float, lon: float, k: int, radius_km: Optional[float] = None, exclude_id: Optional[int] = None,
+) -> list[KremlinNearby]:
+    """То же по mock-данным."""
+    result = []
+    for item in _MOCK_LIST_SNAPSHOT.items:
+        if item.id == exclude_id:
+            continue
+        dist = _haversine_km(lat, lon, item.location.lat, item.location.lon)
+        if radius_km is None or dist <= radius_km:
+            result.append(KremlinNearby(**item.model_dump(), distanceKm=round(dist, 3)))
+    result.sort(key=lambda r: (r.distanceKm, r.id))
+    return result[:k]
+
+
+# ---------------------------------------------------------------------------
+# Поиск
+# ---------------------------------------------------------------------------
+
+SEARCH_MAX_LIMIT = 100
+SEARCH_QUERY_MAX_LENGTH = 200
+# Порог сходства названия для mock-поиска (в БД — pg_trgm.similarity_threshold)
+SEARCH_FUZZY_THRESHOLD = 0.6
+
+_search_adapter = TypeAdapter(list[KremlinSearchResult])
+
+
+async def _query_search(q: str, limit: int) -> list[KremlinSearchResult]:
+    """Поиск по search_vector (russian) и триграммам названия.
+
+    Кандидаты — совпадение websearch_to_tsquery по GIN-индексу
+    search_vector или триграммное сходство названия с запросом
+    (`%`, `<%` по GIN gin_trgm_ops): второе находит названия с
+    опечатками, где стемминг не помогает. Ранг — ts_rank_cd плюс
+    сходство названия, так что точные совпадения по названию выше.
+    """
+    sql = text(f"""
+        WITH query AS (SELECT websearch_to_tsquery('russian', :q) AS tsq)
+        SELECT {_LIST_COLUMNS},
+               ts_rank_cd(search_vector, query.tsq)
+                   + greatest(similarity(name, :q), word_similarity(:q, name)) AS rank
+        FROM fortresses, query
+        WHERE deleted_at IS NULL
+          AND (search_vector @@ query.tsq OR name % :q OR :q <% name)
+        ORDER BY rank DESC, id
+        LIMIT :limit
+    """)
+    async with async_engine.connect() as conn:
+        res = await conn.execute(sql, {"q": q, "limit": limit})
+        results = []
+        for row in res.mappings():
+            item = _row_to_list_item(row)
+            if item is not None:
+                results.append(KremlinSearchResult(**item.model_dump(), rank=round(row["rank"], 4)))
+        return results
+
+
+def _search_in_memory(q: str, limit: int) -> list[KremlinSearchResult]:
+    """То же по mock-данным: все слова запроса в тексте или похожее название."""
+    needle = q.casefold()
+    words = needle.split()
+    results = []
+    for k in KREMLINS_DATA:
+        haystack = " ".join(filter(None, (k.name, k.city, k.description))).casefold()
+        name_sim = difflib.SequenceMatcher(None, needle, k.name.casefold()).ratio()
+        text_hit = all(w in haystack for w in words)
+        if text_hit or name_sim >= SEARCH_FUZZY_THRESHOLD:
+            rank = (1.0 if text_hit else 0.0) + name_sim
+            results.append(KremlinSearchResult(**KremlinListItem(**k.model_dump()).model_dump(), rank=round(rank, 4)))
+    results.sort(key=lambda r: (-r.rank, r.id))
+    return results[:limit]
+
+
+# ---------------------------------------------------------------------------
+# Автодополнение
+# ---------------------------------------------------------------------------
+
+SUGGEST_MAX_LIMIT = 50
+
+_suggest_cache: SnapshotCache[SuggestIndex] = SnapshotCache()
+_MOCK_SUGGEST_INDEX = SuggestIndex(_MOCK_LIST_SNAPSHOT.items)
+# последний построенный из БД индекс и фоновая проверка его версии
+_suggest_index: Optional[SuggestIndex] = None
+_suggest_refresh: Optional[asyncio.Task] = None
+
+
+async def _refresh_suggest_index() -> SuggestIndex:
+    """Индекс для текущей версии данных; строится из снимка списка.
+
+    Пересобирается (в пуле потоков) только при смене версии fortresses.
+    """
+    global _suggest_index
+    try:
+        version = await get_dataset_version()
+        snapshot = await _list_cache.get(version, lambda: _build_list_snapshot(version))
+        if snapshot.items:
+            _suggest_index = await _suggest_cache.get(version, lambda: run_in_threadpool(SuggestIndex, snapshot.items))
+            return _suggest_index
+    except DB_ERRORS:
+        pass
+    return _MOCK_SUGGEST_INDEX
+
+
+async def _get_suggest_index() -> SuggestIndex:
+    """Индекс для автодополнения, не дожидаясь БД.
+
+    Если индекс уже построен, он отдаётся сразу, а версия данных
+    проверяется фоновой задачей: задержка подключения к БД (или её
+    недоступность) не попадает в латентность ввода.
+    """
+    global _suggest_refresh
+    if _suggest_index is None:
+        return await _refresh_suggest_index()
+    if _suggest_refresh is None or _suggest_refresh.done():
+        _suggest_refresh = asyncio.create_task(_refresh_suggest_index())
+    return _suggest_index
+
+
+async def warm_caches() -> None:
+    """Собирает снимок списка и индекс автодополнения при старте процесса."""
+    await _get_suggest_index()
+
+
+# ---------------------------------------------------------------------------
+# Пагинация комментариев
+# ---------------------------------------------------------------------------
+
+COMMENTS_PAGE_SIZE = 20
+COMMENTS_MAX_PAGE_SIZE = 100
+
+
+def _encode_comment_cursor(created_at: datetime, comment_id: int) -> str:
+    """Курсор — позиция последнего комментария страницы: (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), comment_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_comment_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, comment_id = json.loads(raw)
+        created_at, comment_id = datetime.fromisoformat(created_at), int(comment_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Некорректный cursor")
+    # выдаваемые курсоры всегда с часовым поясом; наивное время нельзя
+    # сравнить с created_at (timestamptz)
+    if created_at.tzinfo is None:
+        raise HTTPException(status_code=422, detail="Некорректный cursor")
+    return created_at, comment_id
+
+
+def _paginate_in_memory(comments: list[Comment], limit: int, after: Optional[tuple[datetime, int]]) -> CommentPage:
+    """Та же keyset-пагинация для комментариев в памяти (mock)."""
+    def key(c: Comment) -> tuple[datetime, int]:
+        return datetime.fromisoformat(c.createdAt), c.id
+
+    ordered = sorted(comments, key=key, reverse=True)
+    if after is not None:
+        ordered = [c for c in ordered if key(c) < after]
+    page = ordered[:limit]
+    next_cursor = _encode_comment_cursor(*key(page[-1])) if len(ordered) > limit else None
+    return CommentPage(items=page, nextCursor=next_cursor)
+
+
+# ---------------------------------------------------------------------------
+# Векторные тайлы
+# ---------------------------------------------------------------------------
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MVT_LAYER = "kremlins"
+MVT_MAX_ZOOM = 22
+
+
+async def _render_tile(z: int, x: int, y: int) -> bytes:
+    """Тайл z/x/y слоя kremlins: ST_AsMVT по точкам в его границах.
+
+    Фильтр `location && <границы тайла в 4326>` идёт по GiST-индексу;
+    в геометрию тайла (3857) переводятся только попавшие в него точки.
+    """
+    q = text("""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(ST_Transform(f.location, 3857), bounds.geom, 4096, 64, true) AS geom,
+                   f.id, f.name, f.city, f.foundation_year AS "yearBuilt"
+            FROM fortresses f, bounds
+            WHERE f.location && ST_Transform(bounds.geom, 4326) AND f.deleted_at IS NULL
+        )
+        SELECT ST_AsMVT(mvtgeom.*, :layer, 4096, 'geom') FROM mvtgeom
+    """)
+    async with async_engine.connect() as conn:
+        tile = (await conn.execute(q, {"z": z, "x": x, "y": y, "layer": MVT_LAYER})).scalar()
+    return bytes(tile or b"")
+
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
@@ -272,42 +1118,295 @@ def _require_auth(authorization: Optional[str]) -> dict:
         "Возвращает краткую карточку каждого кремля: id, название, координаты, "
         "превью-изображение, город, год постройки. "
         "Используется для отображения маркеров на карте и в общем списке. "
-        "Не содержит description и полного списка фото — за ними идти на /api/kremlins/{id}."
+        "Не содержит description и полного списка фото — за ними идти на /api/kremlins/{id}.\n\n"
+        "Ответ содержит ETag версии данных; при совпадении If-None-Match "
+        "возвращается 304 без тела. Тело отдаётся в gzip или brotli, "
+        "если клиент указал их в Accept-Encoding.\n\n"
+        "С параметром bbox=minLon,minLat,maxLon,maxLat возвращаются только "
+        "кремли в видимой области карты.\n\n"
+        "Фильтры city, architecturalStyle (без учёта регистра), yearFrom/yearTo "
+        "(год постройки, включительно), hasImage (заглушка placehold.co — не фото) и порядок sort "
+        f"({', '.join(LIST_SORTS)}) выполняются в БД. С любым из этих параметров "
+        f"(или bbox, limit, cursor) ответ постраничный: не больше limit записей "
+        f"(по умолчанию {LIST_MAX_LIMIT}); если есть следующая страница, в ответе "
+        "заголовки X-Result-Truncated: true и X-Next-Cursor — его значение "
+        "передаётся в cursor следующего запроса с теми же параметрами.\n\n"
+        "fields=id,name,location — вернуть только перечисленные поля "
+        f"({', '.join(_LIST_FIELD_COLUMNS)}); id возвращается всегда. "
+        "Из БД читаются только нужные для них колонки."
     ),
+    responses={304: {"description": "Список не изменился с версии из If-None-Match"}},
 )
-def list_kremlins() -> list[KremlinListItem]:
+async def list_kremlins(
+    bbox: Optional[str] = Query(default=None, description="Область карты: minLon,minLat,maxLon,maxLat"),
+    city: Optional[str] = Query(default=None, min_length=1, max_length=200),
+    year_from: Optional[int] = Query(default=None, alias="yearFrom"),
+    year_to: Optional[int] = Query(default=None, alias="yearTo"),
+    architectural_style: Optional[str] = Query(default=None, alias="architecturalStyle", min_length=1, max_length=200),
+    has_image: Optional[bool] = Query(default=None, alias="hasImage"),
+    sort: str = Query(default="id", pattern="^(" + "|".join(LIST_SORTS) + ")$"),
+    limit: Optional[int] = Query(default=None, ge=1, le=LIST_MAX_LIMIT, description="Размер страницы"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor предыдущей страницы"),
+    fields: Optional[str] = Query(default=None, description="Поля ответа через запятую, например id,location"),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+) -> Response:
     """Возвращает все кремли как KremlinListItem (без тяжёлых полей).
 
-    Пытаемся прочитать из БД (таблица fortresses). Если подключение к БД
-    не удалось — возвращаем mock-данные из KREMLINS_DATA.
+    Список берётся из снимка, который пересобирается только при смене
+    версии набора данных fortresses; тело ответа отдаётся как есть,
+    без повторной валидации и сериализации. Если подключение к БД не
+    удалось или таблица пуста — возвращаем mock-данные из KREMLINS_DATA.
+
+    Запрос с bbox, фильтрами, сортировкой или пагинацией идёт мимо снимка:
+    `location && ST_MakeEnvelope(...)` по GiST-индексу idx_fortresses_location,
+    остальные условия и keyset-пагинация `(column, id) > (...)` — по
+    частичным индексам ix_fortresses_*_id.
+
+    С fields в SELECT попадают только колонки этих полей (и колонка
+    сортировки для курсора); без фильтров сокращённое тело собирается
+    из снимка и кэшируется вместе с ним.
     """
+    selected = _parse_fields(fields, _LIST_FIELD_COLUMNS)
+    filters = ListFilters(city, year_from, year_to, architectural_style, has_image)
+    if bbox is not None or not filters.is_empty() or sort != "id" or limit is not None or cursor is not None:
+        area = _parse_bbox(bbox) if bbox is not None else None
+        order = LIST_SORTS[sort]
+        after = _decode_list_cursor(cursor, sort) if cursor is not None else None
+        limit = limit or LIST_MAX_LIMIT
+        try:
+            params: dict = {}
+            where = filters.to_sql(params)
+            if area is not None:
+                where.append(area.to_sql(params))
+            if after is not None:
+                where.append(order.after_sql(*after, params))
+            if selected is None:
+                items, truncated = await _query_list_items(where, params, limit, order)
+                body = _list_adapter.dump_json(items)
+                last = order.position(items[-1]) if items else None
+            else:
+                needed = (*selected, order.field) if order.field else selected
+                rows, truncated = await _query_list_rows(
+                    where, params, limit, order, _select_columns(needed, _LIST_FIELD_COLUMNS),
+                )
+                body = _sparse_list_adapter.dump_json([_row_to_fields(r, selected) for r in rows])
+                last = order.row_position(rows[-1]) if rows else None
+        except DB_ERRORS:
+            mock = _MOCK_LIST_SNAPSHOT.items
+            if area is not None:
+                mock = [k for k in mock if area.contains(k.location.lat, k.location.lon)]
+            items, truncated = _list_in_memory(mock, filters, order, after, limit)
+            body = _dump_list(items, selected)
+            last = order.position(items[-1]) if items else None
+        next_cursor = _encode_list_cursor(sort, *last) if truncated and last else None
+        return _list_response(body, truncated, next_cursor)
+
+    snapshot: Optional[KremlinListSnapshot] = None
     try:
-        with engine.connect() as conn:
-            q = text(
-                "SELECT id, name, ST_X(location) AS lon, ST_Y(location) AS lat, image_url, foundation_year, city FROM fortresses")
-            res = conn.execute(q)
-            items: list[KremlinListItem] = []
-            for row in res.mappings():
-                lat = row.get("lat")
-                lon = row.get("lon")
-                if lat is None or lon is None:
-                    continue
-                loc = KremlinLocation(lat=lat, lon=lon)
-                items.append(KremlinListItem(
-                    id=row["id"],
-                    name=row["name"],
-                    location=loc,
-                    previewImageUrl=row.get("image_url"),
-                    city=row.get("city"),
-                    yearBuilt=row.get("foundation_year")
-                ))
-            if items:
-                return items
-    except SQLAlchemyError:
+        version = await get_dataset_version()
+        snapshot = await _list_cache.get(version, lambda: _build_list_snapshot(version))
+    except DB_ERRORS:
         # БД недоступна или запрос не удался — используем mock
         pass
+    if snapshot is None or not snapshot.items:
+        snapshot = _MOCK_LIST_SNAPSHOT
+
+    body = snapshot.body if selected is None else await _sparse_list_body(snapshot, selected)
+    return _prerendered_response(body, if_none_match, accept_encoding)
+
+
+@router.get(
+    "/clusters",
+    response_model=list[KremlinCluster],
+    summary="Кластеры маркеров для карты",
+    description=(
+        "Группирует кремли по сетке, размер ячейки которой зависит от зума "
+        f"(~{CLUSTER_CELL_PX}px экрана). Для каждого кластера — число объектов, "
+        "центроид и границы (чтобы приблизить карту по клику); одиночные точки "
+        "возвращаются с kremlinId. С bbox — только кластеры, чей центроид "
+        "попадает в область. Размер ответа зависит от области экрана, а не от "
+        "размера набора данных."
+    ),
+)
+async def list_clusters(
+    zoom: int = Query(..., ge=0, le=22, description="Зум карты (как у тайлов OSM)"),
+    bbox: Optional[str] = Query(default=None, description="Область карты: minLon,minLat,maxLon,maxLat"),
+) -> Response:
+    """Кластеры для зума из пирамиды текущей версии данных (или из mock)."""
+    area = _parse_bbox(bbox) if bbox is not None else None
+    level = min(zoom, CLUSTER_MAX_ZOOM)
+    clusters: Optional[list[KremlinCluster]] = None
+    try:
+        version = await get_dataset_version()
+        pyramid = await _cluster_cache.get(version, _empty_pyramid)
+        clusters = pyramid.get(level)
+        if clusters is None:
+            clusters = pyramid[level] = await _query_clusters(level)
+    except DB_ERRORS:
+        pass
+    if not clusters:
+        clusters = _cluster_in_memory(_MOCK_LIST_SNAPSHOT.items, level)
 
-    return [KremlinListItem(**k.model_dump()) for k in KREMLINS_DATA]
+    if area is not None:
+        clusters = [c for c in clusters if area.contains(c.location.lat, c.location.lon)]
+    return Response(content=_cluster_adapter.dump_json(clusters), media_type="application/json")
+
+
+@router.get(
+    "/nearest",
+    response_model=list[KremlinNearby],
+    summary="Ближайшие к точке кремли",
+    description=(
+        "k ближайших к точке (lat, lon) кремлей, от ближнего к дальнему, "
+        "с расстоянием distanceKm по поверхности Земли. Запрос использует "
+        "KNN-поиск (<->) по GiST-индексу координат."
+    ),
+)
+async def nearest_kremlins(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(default=10, ge=1, le=NEAREST_MAX_K),
+) -> Response:
+    try:
+        items = await _query_nearest(
+            "ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)", {"lat": lat, "lon": lon}, k, None,
+        )
+    except DB_ERRORS:
+        items = _nearest_in_memory(lat, lon, k)
+    return Response(content=_nearby_adapter.dump_json(items), media_type="application/json")
+
+
+@router.get(
+    "/search",
+    response_model=list[KremlinSearchResult],
+    summary="Поиск кремлей",
+    description=(
+        "Полнотекстовый поиск по названию, городу и описанию (морфология "
+        "русского языка: «кремлём» найдёт «кремль») с учётом опечаток в "
+        "названии (pg_trgm). Результаты отсортированы по релевантности rank. "
+        "Поддерживается синтаксис websearch: «\"точная фраза\"», «-исключить», «or»."
+    ),
+)
+async def search_kremlins(
+    q: str = Query(..., min_length=1, max_length=SEARCH_QUERY_MAX_LENGTH, description="Поисковый запрос"),
+    limit: int = Query(default=20, ge=1, le=SEARCH_MAX_LIMIT),
+) -> Response:
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=422, detail="Пустой поисковый запрос")
+    try:
+        items = await _query_search(q, limit)
+    except DB_ERRORS:
+        items = _search_in_memory(q, limit)
+    return Response(content=_search_adapter.dump_json(items), media_type="application/json")
+
+
+@router.get(
+    "/suggest",
+    response_model=list[KremlinListItem],
+    summary="Автодополнение по названию и городу",
+    description=(
+        "Кремли, название или город которых начинается с prefix (или слово в "
+        "них начинается с prefix). Регистр и ё/е не различаются, латиница "
+        "транслитерируется («kazan» найдёт «Казанский кремль»). Отвечает из "
+        "индекса в памяти процесса, без запроса к БД."
+    ),
+)
+async def suggest_kremlins(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=SUGGEST_MAX_LIMIT),
+) -> Response:
+    index = await _get_suggest_index()
+    return Response(content=_list_adapter.dump_json(index.suggest(prefix, limit)), media_type="application/json")
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}.pbf",
+    summary="Векторный тайл слоя кремлей",
+    description=(
+        "Mapbox Vector Tile (слой kremlins: id, name, city, yearBuilt) для "
+        "тайла z/x/y в схеме XYZ. Тайлы кэшируются на диске до смены версии "
+        "набора данных; ответ содержит ETag этой версии. Пустой тайл — 204."
+    ),
+    response_class=Response,
+    responses={
+        200: {"content": {MVT_MEDIA_TYPE: {}}},
+        204: {"description": "В тайле нет объектов"},
+        304: {"description": "Тайл не изменился"},
+    },
+)
+async def get_tile(
+    z: int,
+    x: int,
+    y: int,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    """Тайл из дискового кэша или, при промахе, из PostGIS (ST_AsMVT)."""
+    if not (0 <= z <= MVT_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Тайл не найден")
+    headers = {"Cache-Control": "no-cache"}
+    try:
+        version = await get_dataset_version()
+    except DB_ERRORS:
+        raise HTTPException(status_code=503, detail="Тайлы недоступны: нет подключения к БД")
+    if version is not None:
+        headers["ETag"] = f'"tile-{version}-{z}-{x}-{y}"'
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    tile = None
+    if version is not None:
+        # Сбой дискового кэша не повод отказывать: тайл отрендерим из БД
+        try:
+            tile = await tile_cache.read(version, z, x, y)
+        except OSError:
+            logger.exception("Не удалось прочитать тайл %s/%s/%s из кэша", z, x, y)
+    if tile is None:
+        try:
+            tile = await _render_tile(z, x, y)
+        except DB_ERRORS:
+            raise HTTPException(status_code=503, detail="Тайлы недоступны: нет подключения к БД")
+        if version is not None:
+            try:
+                await tile_cache.write(version, z, x, y, tile)
+            except OSError:
+                logger.exception("Не удалось записать тайл %s/%s/%s в кэш", z, x, y)
+
+    if not tile:
+        return Response(status_code=204, headers=headers)
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+
+@router.get(
+    "/batch",
+    response_model=KremlinBatch,
+    summary="Детали нескольких кремлей одним запросом",
+    description=(
+        "ids=3,1,2 — детали (как у /api/kremlins/{id}) всех перечисленных кремлей "
+        "в порядке запроса; id, которых нет, перечислены в missing. "
+        f"Не больше {BATCH_MAX_IDS} id; для длинных списков есть POST /api/kremlins/batch. "
+        "Поддерживает fields, как и /api/kremlins/{id}."
+    ),
+)
+async def get_kremlins_batch(
+    ids: str = Query(..., description="id через запятую"),
+    fields: Optional[str] = Query(default=None, description="Поля ответа через запятую"),
+) -> Response:
+    return await _batch_response(_parse_ids(ids), fields)
+
+
+@router.post(
+    "/batch",
+    response_model=KremlinBatch,
+    summary="Детали нескольких кремлей одним запросом (id в теле)",
+    description="То же, что GET /api/kremlins/batch, но список id передаётся в теле: {\"ids\": [3, 1, 2]}.",
+)
+async def post_kremlins_batch(
+    body: KremlinBatchRequest,
+    fields: Optional[str] = Query(default=None, description="Поля ответа через запятую"),
+) -> Response:
+    return await _batch_response(body.ids, fields)
 
 
 @router.get(
@@ -318,82 +1417,205 @@ def list_kremlins() -> list[KremlinListItem]:
         "Возвращает полные данные кремля: всё из KremlinListItem плюс "
         "description, wikipediaUrl, wikidataId, images, commentsCount. "
         "Используется на странице /kremlins/{id}. "
-        "Возвращает 404, если кремль с таким id не существует."
+        "Возвращает 404, если кремль с таким id не существует.\n\n"
+        "fields=id,name,description — вернуть только перечисленные поля "
+        "(id возвращается всегда); из БД читаются только нужные для них колонки."
     ),
 )
-def get_kremlin(kremlin_id: int) -> KremlinDetail:
+async def get_kremlin(
+    kremlin_id: int,
+    fields: Optional[str] = Query(default=None, description="Поля ответа через запятую, например name,description"),
+) -> Union[KremlinDetail, Response]:
     """Возвращает KremlinDetail по id или 404.
 
     Пытаемся сначала прочитать из БД, иначе возвращаем mock.
     """
+    selected = _parse_fields(fields, _DETAIL_FIELD_COLUMNS)
     try:
-        with engine.connect() as conn:
-            q = text(
-                "SELECT id, name, ST_X(location) AS lon, ST_Y(location) AS lat, image_url, description, foundation_year, wikipedia_url, wikidata_id FROM fortresses WHERE id = :id"
-            )
-            res = conn.execute(q, {"id": kremlin_id}).mappings().first()
-            if res:
-                lat = res.get("lat")
-                lon = res.get("lon")
-                loc = KremlinLocation(lat=lat or 0.0, lon=lon or 0.0)
-                return KremlinDetail(
-                    id=res["id"], name=res["name"], location=loc,
-                    previewImageUrl=res.get("image_url"), city=None, yearBuilt=res.get("foundation_year"),
-                    description=res.get("description"), wikipediaUrl=res.get("wikipedia_url"), wikidataId=res.get("wikidata_id"),
-                    images=[res.get("image_url")] if res.get("image_url") else [], commentsCount=0,
+        async with async_engine.connect() as conn:
+            if selected is not None:
+                q = text(
+                    f"SELECT {_select_columns(selected, _DETAIL_FIELD_COLUMNS)} FROM fortresses "
+                    "WHERE id = :id AND deleted_at IS NULL"
                 )
-    except SQLAlchemyError:
+            else:
+                q = text(f"SELECT {_DETAIL_COLUMNS} FROM fortresses WHERE id = :id AND deleted_at IS NULL")
+            res = (await conn.execute(q, {"id": kremlin_id})).mappings().first()
+            if res and selected is not None:
+                return Response(content=_sparse_adapter.dump_json(_row_to_fields(res, selected)), media_type="application/json")
+            if res:
+                return _row_to_detail(res)
+    except DB_ERRORS:
         pass
 
-    kremlin = _KREMLINS_BY_ID.get(kremlin_id)
+    kremlin = _mock_detail(kremlin_id)
     if not kremlin:
         raise HTTPException(status_code=404, detail="Кремль не найден")
+    if selected is not None:
+        return Response(content=kremlin.model_dump_json(include=set(selected)), media_type="application/json")
     return kremlin
 
 
+@router.get(
+    "/{kremlin_id}/nearby",
+    response_model=list[KremlinNearby],
+    summary="Кремли рядом с данным",
+    description=(
+        "k ближайших к кремлю kremlin_id других кремлей (сам он не входит) "
+        "с расстоянием distanceKm; radius_km ограничивает радиус поиска. "
+        "Возвращает 404, если кремль с таким id не существует."
+    ),
+)
+async def nearby_kremlins(
+    kremlin_id: int,
+    k: int = Query(default=10, ge=1, le=NEAREST_MAX_K),
+    radius_km: Optional[float] = Query(default=None, gt=0, le=5000),
+) -> Response:
+    try:
+        async with async_engine.connect() as conn:
+            exists = (await conn.execute(
+                text("SELECT 1 FROM fortresses WHERE id = :id AND location IS NOT NULL AND deleted_at IS NULL"), {"id": kremlin_id}
+            )).scalar()
+        if exists:
+            items = await _query_nearest(
+                "(SELECT location FROM fortresses WHERE id = :ref_id)",
+                {"ref_id": kremlin_id, "exclude_id": kremlin_id}, k, radius_km,
+            )
+            return Response(content=_nearby_adapter.dump_json(items), media_type="application/json")
+    except DB_ERRORS:
+        pass
+
+    kremlin = _KREMLINS_BY_ID.get(kremlin_id)
+    if not kremlin:
+        raise HTTPException(status_code=404, detail="Кремль не найден")
+    items = _nearest_in_memory(kremlin.location.lat, kremlin.location.lon, k, radius_km, exclude_id=kremlin_id)
+    return Response(content=_nearby_adapter.dump_json(items), media_type="application/json")
+
+
 @router.get(
     "/{kremlin_id}/comments",
-    response_model=list[Comment],
+    response_model=CommentPage,
     summary="Комментарии к кремлю",
     description=(
-        "Возвращает список комментариев для указанного кремля. "
+        "Возвращает страницу комментариев для указанного кремля. "
         "Если кремль не существует — 404. "
-        "Пустой массив — нормальный ответ (комментариев ещё нет). "
-        "Комментарии отсортированы по убыванию даты (новые первыми). "
-        "Пагинация: при реализации добавить query-параметры offset и limit."
+        "Пустой список items — нормальный ответ (комментариев ещё нет). "
+        "Комментарии отсортированы по убыванию даты (новые первыми).\n\n"
+        "Пагинация курсорная: limit задаёт размер страницы, nextCursor из "
+        "ответа передаётся в параметр cursor для следующей страницы; "
+        "на последней странице nextCursor = null."
     ),
 )
-def list_comments(kremlin_id: int) -> list[Comment]:
-    """Возвращает комментарии к кремлю или 404 если кремль не найден.
+async def list_comments(
+    kremlin_id: int,
+    limit: int = Query(default=COMMENTS_PAGE_SIZE, ge=1, le=COMMENTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None, description="nextCursor предыдущей страницы"),
+) -> CommentPage:
+    """Возвращает страницу комментариев к кремлю или 404 если кремль не найден.
     Пытаемся прочитать комментарии из БД, в противном случае — из памяти.
+
+    Keyset-пагинация по (created_at DESC, id DESC) идёт по индексу
+    ix_comments_kremlin_created_id, поэтому стоимость страницы не зависит
+    от её номера и общего числа комментариев.
     """
+    after = _decode_comment_cursor(cursor) if cursor else None
+
     # Попробуем получить из БД
     try:
         from ..models import Comment as DBComment
-        from ..database import SessionLocal
-        db = SessionLocal()
-        rows = db.query(DBComment).filter(DBComment.kremlin_id == kremlin_id).order_by(DBComment.created_at.desc()).all()
-        db.close()
-        if rows:
-            return [
-                Comment(
-                    id=r.id,
-                    kremlinId=r.kremlin_id,
-                    authorId=r.author_id,
-                    authorName=r.author_name,
-                    authorAvatarUrl=r.author_avatar_url,
-                    text=r.text,
-                    imageUrls=r.image_urls or [],
-                    createdAt=(r.created_at.isoformat() if r.created_at else ""),
-                )
-                for r in rows
-            ]
+        from ..database import AsyncSessionLocal
+        q = select(DBComment).where(DBComment.kremlin_id == kremlin_id)
+        if after is not None:
+            q = q.where(tuple_(DBComment.created_at, DBComment.id) < tuple_(*after))
+        q = q.order_by(DBComment.created_at.desc(), DBComment.id.desc()).limit(limit + 1)
+        # async with — чтобы соединение вернулось в пул и при исключении
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(q)).scalars().all()
+        if rows or after is not None:
+            page = rows[:limit]
+            next_cursor = None
+            if len(rows) > limit:
+                next_cursor = _encode_comment_cursor(page[-1].created_at, page[-1].id)
+            return CommentPage(
+                items=[
+                    Comment(
+                        id=r.id,
+                        kremlinId=r.kremlin_id,
+                        authorId=r.author_id,
+                        authorName=r.author_name,
+                        authorAvatarUrl=r.author_avatar_url,
+                        text=r.text,
+                        imageUrls=r.image_urls or [],
+                        imageVariants=r.image_variants or [],
+                        createdAt=(r.created_at.isoformat() if r.created_at else ""),
+                    )
+                    for r in page
+                ],
+                nextCursor=next_cursor,
+            )
     except Exception:
         pass
 
     if kremlin_id not in _KREMLINS_BY_ID:
         raise HTTPException(status_code=404, detail="Кремль не найден")
-    return COMMENTS_DATA.get(kremlin_id, [])
+    return _paginate_in_memory(COMMENTS_DATA.get(kremlin_id, []), limit, after)
+
+
+@router.post(
+    "/{kremlin_id}/comments/uploads",
+    response_model=UploadPresignResponse,
+    summary="Получить presigned URL для прямой загрузки фото",
+    description=(
+        "Клиент передаёт sha256 (hex), размер, Content-Type и имя файла и "
+        "получает key и upload — URL, метод и заголовки, с которыми файл "
+        "нужно отправить прямо в хранилище, минуя API. Затем key "
+        "передаётся в imageKeys при создании комментария. Миниатюры API строит "
+        "в фоне после ответа; до этого imageVariants такого фото указывают на "
+        "оригинал.\n\n"
+        "upload = null — такой файл уже загружен. Подпись фиксирует размер и "
+        "sha256: хранилище отклонит другое содержимое.\n\n"
+        "Требует авторизации. Для локального хранилища — 501."
+    ),
+)
+async def presign_comment_upload(
+    kremlin_id: int,
+    body: UploadPresignRequest,
+    authorization: Optional[str] = Header(default=None),
+) -> UploadPresignResponse:
+    _require_auth(authorization)
+    return await presign_upload(body.sha256, body.size, body.contentType, body.filename)
+
+
+async def _fill_comment_variants(comment_id: int, keys: list[str], mock_comment: Optional[Comment] = None) -> None:
+    """Фоновая задача: строит варианты фото из imageKeys и подставляет их в комментарий.
+
+    mock_comment — комментарий из in-memory fallback; иначе обновляется
+    строка в БД.
+    """
+    try:
+        built = {v.original: v for v in await build_missing_variants(keys)}
+    except Exception:
+        logger.exception("Не удалось построить варианты фото комментария %s", comment_id)
+        return
+    if not built:
+        return
+    if mock_comment is not None:
+        mock_comment.imageVariants = [built.get(v.original, v) for v in mock_comment.imageVariants]
+        return
+    from ..models import Comment as DBComment
+
+    try:
+        async with AsyncSessionLocal() as db:
+            db_comment = await db.get(DBComment, comment_id)
+            if db_comment is None:
+                return
+            db_comment.image_variants = [
+                built[v["original"]].model_dump() if v["original"] in built else v
+                for v in db_comment.image_variants or []
+            ]
+            await db.commit()
+    except DB_ERRORS:
+        logger.exception("Не удалось сохранить варианты фото комментария %s", comment_id)
 
 
 @router.post(
@@ -404,9 +1626,15 @@ def list_comments(kremlin_id: int) -> list[Comment]:
     description=(
         "Принимает multipart/form-data:\n"
         "  - text (str, обязательно) — текст комментария;\n"
-        "  - images (list[UploadFile], опционально) — фотографии.\n\n"
+        "  - images (файлы, опционально) — фотографии;\n"
+        "  - imageKeys (list[str], опционально) — ключи фото, загруженных напрямую "
+        "в хранилище через POST /{kremlin_id}/comments/uploads.\n\n"
+        "Комментарий без файлов можно отправить и как "
+        "application/x-www-form-urlencoded (text, imageKeys).\n\n"
         "Требует авторизации: заголовок Authorization: Bearer <token>. "
         "Без токена — 401 Unauthorized.\n\n"
+        f"Ограничения: до {UPLOAD_MAX_FILES} файлов, до {UPLOAD_MAX_FILE_BYTES // (1024 * 1024)} МиБ "
+        f"на файл и {UPLOAD_MAX_REQUEST_BYTES // (1024 * 1024)} МиБ на запрос; превышение — 413.\n\n"
         "Возвращает созданный Comment с id, kremlinId, временем создания.\n\n"
         "При реализации:\n"
         "  - верифицировать JWT и извлечь authorId;\n"
@@ -414,15 +1642,61 @@ def list_comments(kremlin_id: int) -> list[Comment]:
         "  - атомарно инкрементировать commentsCount у кремля;\n"
         "  - сохранить комментарий в БД."
     ),
+    # Тело разбирается вручную (receive_form), поэтому схема формы
+    # описана здесь, а не выводится из параметров
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["text"],
+                        "properties": {
+                            "text": {"type": "string", "description": "Текст комментария"},
+                            "images": {
+                                "type": "array",
+                                "items": {"type": "string", "format": "binary"},
+                                "description": "Фотографии (опционально)",
+                            },
+                            "imageKeys": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Ключи фото, загруженных напрямую в хранилище",
+                            },
+                        },
+                    }
+                },
+                "application/x-www-form-urlencoded": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["text"],
+                        "properties": {
+                            "text": {"type": "string", "description": "Текст комментария"},
+                            "imageKeys": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Ключи фото, загруженных напрямую в хранилище",
+                            },
+                        },
+                    }
+                },
+            },
+        }
+    },
 )
 async def create_comment(
     kremlin_id: int,
-    text: str = Form(..., description="Текст комментария"),
-    images: list[UploadFile] = File(default=[], description="Фотографии (опционально)"),
+    request: Request,
+    background_tasks: BackgroundTasks,
     authorization: Optional[str] = Header(default=None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Comment:
-    """Создаёт комментарий. Требует Bearer-токен."""
+    """Создаёт комментарий. Требует Bearer-токен.
+
+    Авторизация проверяется до чтения тела; файлы принимаются потоково,
+    с лимитами на каждом чанке (core.uploads.receive_form).
+    """
     global _next_comment_id
 
     user = _require_auth(authorization)
@@ -430,18 +1704,18 @@ async def create_comment(
     if kremlin_id not in _KREMLINS_BY_ID and db is None:
         raise HTTPException(status_code=404, detail="Кремль не найден")
 
-    upload_dir = os.path.join("static", "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-    urls: list[str] = []
-    for up in images:
-        if not up.filename:
-            continue
-        ext = os.path.splitext(up.filename)[1]
-        filename = f"{int(datetime.now().timestamp())}_{uuid.uuid4().hex}{ext}"
-        dest_path = os.path.join(upload_dir, filename)
-        with open(dest_path, "wb") as f:
-            shutil.copyfileobj(up.file, f)
-        urls.append(f"/static/uploads/{filename}")
+    async with receive_form(request) as form:
+        text = form.get("text")
+        if not text:
+            raise HTTPException(status_code=422, detail="Поле text обязательно")
+        imageKeys = form.fields.get("imageKeys", [])
+        if len(imageKeys) + len(form.files) > UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Не больше {UPLOAD_MAX_FILES} файлов в комментарии")
+        # Файлы уже во временных файлах с sha256; параллельно публикуются в
+        # хранилище, миниатюры и веб-версии строятся в отдельном пуле процессов
+        variants = await save_uploads(form.files)
+    variants += await resolve_upload_keys(imageKeys)
+    urls = [v.original for v in variants]
 
     created_at = datetime.now(timezone.utc)
 
@@ -455,15 +1729,23 @@ async def create_comment(
             author_avatar_url=None,
             text=text,
             image_urls=urls,
+            image_variants=[v.model_dump() for v in variants],
             created_at=created_at,
         )
         db.add(db_comment)
-        kremlin_row = db.query(DBKremlin).filter(DBKremlin.id == kremlin_id).first()
-        if kremlin_row:
-            kremlin_row.comments_count = (kremlin_row.comments_count or 0) + 1
-        db.commit()
-        db.refresh(db_comment)
+        # Атомарный инкремент в БД вместо read-modify-write через ORM:
+        # параллельные комментарии не теряют обновления, а блокировка
+        # строки держится только до commit в этой же транзакции
+        await db.execute(
+            update(DBKremlin)
+            .where(DBKremlin.id == kremlin_id)
+            .values(comments_count=func.coalesce(DBKremlin.comments_count, 0) + 1)
+        )
+        await db.commit()
+        await db.refresh(db_comment)
 
+        if imageKeys:
+            background_tasks.add_task(_fill_comment_variants, db_comment.id, imageKeys)
         return Comment(
             id=db_comment.id,
             kremlinId=db_comment.kremlin_id,
@@ -472,11 +1754,12 @@ async def create_comment(
             authorAvatarUrl=db_comment.author_avatar_url,
             text=db_comment.text,
             imageUrls=db_comment.image_urls or [],
+            imageVariants=db_comment.image_variants or [],
             createdAt=db_comment.created_at.isoformat(),
         )
     except Exception:
         # если что-то пошло не так с БД — падаем обратно к in-memory
-        pass
+        await db.rollback()
 
     # Fallback: store in memory
     comment_id = _next_comment_id
@@ -491,8 +1774,11 @@ async def create_comment(
         authorName=author_name,
         authorAvatarUrl=None,
         text=text,
-        imageUrls=urls,  # локальные URL /static/uploads/...
+        imageUrls=urls,  # URL в хранилище (/static/uploads/... или S3)
+        imageVariants=variants,
         createdAt=created_at.isoformat(),
     )
     COMMENTS_DATA.setdefault(kremlin_id, []).append(new_comment)
+    if imageKeys:
+        background_tasks.add_task(_fill_comment_variants, comment_id, imageKeys, new_comment)
     return new_comment
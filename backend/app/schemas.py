@@ -22,6 +22,13 @@ class KremlinLocation(BaseSchema):
     lon: float
 
 
+class ImageVariants(BaseSchema):
+    """Одно изображение в нескольких размерах: миниатюра (320px), веб-версия (1280px), оригинал."""
+    original: str
+    thumb: str
+    medium: str
+
+
 class KremlinListItem(BaseSchema):
     """
     Краткая карточка кремля — используется в списке и на карте.
@@ -40,9 +47,42 @@ class KremlinDetail(KremlinListItem):
     wikipediaUrl: Optional[str] = None
     wikidataId: Optional[str] = None
     images: list[str] = []
+    imageVariants: list[ImageVariants] = []  # те же images в разных размерах
     commentsCount: int = 0
 
 
+class KremlinBatchRequest(BaseSchema):
+    """id кремлей для пакетной загрузки деталей (POST /api/kremlins/batch)."""
+    ids: list[int]
+
+
+class KremlinBatch(BaseSchema):
+    """Детали кремлей в порядке запрошенных id; missing — id, которых нет."""
+    items: list[KremlinDetail]
+    missing: list[int] = []
+
+
+class KremlinNearby(KremlinListItem):
+    """Карточка кремля с расстоянием (по поверхности Земли) до точки запроса."""
+    distanceKm: float
+
+
+class KremlinSearchResult(KremlinListItem):
+    """Карточка кремля, найденная поиском; rank — релевантность (больше — выше)."""
+    rank: float
+
+
+class KremlinCluster(BaseSchema):
+    """
+    Группа близких кремлей на заданном масштабе карты.
+    Для одиночной точки заполнен kremlinId — её можно рисовать обычным маркером.
+    """
+    count: int
+    location: KremlinLocation
+    kremlinId: Optional[int] = None
+    bounds: Optional[list[float]] = None  # [minLon, minLat, maxLon, maxLat]
+
+
 # ---------------------------------------------------------------------------
 # Comment
 # ---------------------------------------------------------------------------
@@ -56,9 +96,40 @@ class Comment(BaseSchema):
     authorAvatarUrl: Optional[str] = None
     text: str
     imageUrls: list[str] = []
+    imageVariants: list[ImageVariants] = []  # те же imageUrls в разных размерах
     createdAt: str
 
 
+class CommentPage(BaseSchema):
+    """Страница комментариев; nextCursor = null на последней странице."""
+    items: list[Comment]
+    nextCursor: Optional[str] = None
+
+
+class UploadPresignRequest(BaseSchema):
+    """Файл, который клиент хочет загрузить напрямую в хранилище."""
+    sha256: str  # hex, 64 символа
+    size: int
+    contentType: str
+    filename: str
+
+
+class PresignedUpload(BaseSchema):
+    url: str
+    method: str
+    headers: dict[str, str]
+
+
+class UploadPresignResponse(BaseSchema):
+    """key передаётся в imageKeys при создании комментария.
+
+    upload = null — файл с таким содержимым уже есть в хранилище, грузить не нужно.
+    """
+    key: str
+    url: str
+    upload: Optional[PresignedUpload] = None
+
+
 # ---------------------------------------------------------------------------
 # Auth / User
 # ---------------------------------------------------------------------------
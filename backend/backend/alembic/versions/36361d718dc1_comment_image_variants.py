@@ -0,0 +1,29 @@
+"""comment image variants
+
+Revision ID: 36361d718dc1
+Revises: 8a63ea907eed
+Create Date: 2026-10-17 11:48:19.552074
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '36361d718dc1'
+down_revision: Union[str, Sequence[str], None] = '8a63ea907eed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('comments', sa.Column('image_variants', postgresql.JSON(astext_type=sa.Text()), server_default='[]', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('comments', 'image_variants')
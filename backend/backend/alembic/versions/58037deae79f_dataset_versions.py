@@ -0,0 +1,69 @@
+"""dataset versions
+
+Revision ID: 58037deae79f
+Revises: dd32cc8687f5
+Create Date: 2026-10-17 10:12:03.418221
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '58037deae79f'
+down_revision: Union[str, Sequence[str], None] = 'dd32cc8687f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+VERSIONED_COLUMNS = (
+    "name, location, description, foundation_year, architectural_style, "
+    "image_url, city, wikipedia_url, wikidata_id"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'dataset_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.execute(
+        "INSERT INTO dataset_versions (name, version) "
+        "VALUES ('fortresses', (extract(epoch FROM clock_timestamp()) * 1000)::bigint)"
+    )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_dataset_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO dataset_versions (name, version, updated_at)
+            VALUES (TG_TABLE_NAME, (extract(epoch FROM clock_timestamp()) * 1000)::bigint, now())
+            ON CONFLICT (name) DO UPDATE SET
+                version = GREATEST(dataset_versions.version + 1, EXCLUDED.version),
+                updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute(
+        "CREATE TRIGGER fortresses_dataset_version_iud "
+        "AFTER INSERT OR DELETE OR TRUNCATE ON fortresses "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();"
+    )
+    op.execute(
+        f"CREATE TRIGGER fortresses_dataset_version_upd "
+        f"AFTER UPDATE OF {VERSIONED_COLUMNS} ON fortresses "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS fortresses_dataset_version_upd ON fortresses;")
+    op.execute("DROP TRIGGER IF EXISTS fortresses_dataset_version_iud ON fortresses;")
+    op.execute("DROP FUNCTION IF EXISTS bump_dataset_version();")
+    op.drop_table('dataset_versions')
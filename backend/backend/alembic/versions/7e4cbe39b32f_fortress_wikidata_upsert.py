@@ -0,0 +1,76 @@
+"""fortress wikidata upsert
+
+Revision ID: 7e4cbe39b32f
+Revises: 36361d718dc1
+Create Date: 2026-10-17 14:31:07.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4cbe39b32f'
+down_revision: Union[str, Sequence[str], None] = '36361d718dc1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+OLD_VERSIONED_COLUMNS = (
+    "name, location, description, foundation_year, architectural_style, "
+    "image_url, city, wikipedia_url, wikidata_id"
+)
+VERSIONED_COLUMNS = OLD_VERSIONED_COLUMNS + ", deleted_at"
+
+
+def _recreate_update_trigger(columns: str) -> None:
+    op.execute("DROP TRIGGER IF EXISTS fortresses_dataset_version_upd ON fortresses;")
+    op.execute(
+        f"CREATE TRIGGER fortresses_dataset_version_upd "
+        f"AFTER UPDATE OF {columns} ON fortresses "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('fortresses', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Прежние полные перезагрузки могли записать один объект Wikidata
+    # несколько раз: комментарии переносятся на строку с наименьшим id,
+    # дубликаты удаляются
+    op.execute("""
+        CREATE TEMP TABLE fortress_duplicates ON COMMIT DROP AS
+        SELECT id, min(id) OVER (PARTITION BY wikidata_id) AS keep_id
+        FROM fortresses
+        WHERE wikidata_id IS NOT NULL
+    """)
+    op.execute("""
+        UPDATE comments c SET kremlin_id = d.keep_id
+        FROM fortress_duplicates d
+        WHERE c.kremlin_id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute("""
+        DELETE FROM fortresses f
+        USING fortress_duplicates d
+        WHERE f.id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute("""
+        UPDATE fortresses f SET comments_count = (
+            SELECT count(*) FROM comments c WHERE c.kremlin_id = f.id
+        )
+        WHERE f.id IN (SELECT keep_id FROM fortress_duplicates WHERE id <> keep_id)
+    """)
+
+    op.create_index('ux_fortresses_wikidata_id', 'fortresses', ['wikidata_id'], unique=True)
+    # мягкое удаление тоже должно сбрасывать кэши
+    _recreate_update_trigger(VERSIONED_COLUMNS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate_update_trigger(OLD_VERSIONED_COLUMNS)
+    op.drop_index('ux_fortresses_wikidata_id', table_name='fortresses')
+    op.drop_column('fortresses', 'deleted_at')
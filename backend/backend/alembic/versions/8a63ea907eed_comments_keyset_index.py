@@ -0,0 +1,33 @@
+"""comments keyset index
+
+Revision ID: 8a63ea907eed
+Revises: 58037deae79f
+Create Date: 2026-10-17 11:02:41.907315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a63ea907eed'
+down_revision: Union[str, Sequence[str], None] = '58037deae79f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_comments_kremlin_created_id',
+        'comments',
+        ['kremlin_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_comments_kremlin_created_id', table_name='comments')
@@ -0,0 +1,46 @@
+"""fortress search
+
+Revision ID: b6a3bca05829
+Revises: 7e4cbe39b32f
+Create Date: 2026-10-17 15:02:44.871930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6a3bca05829'
+down_revision: Union[str, Sequence[str], None] = '7e4cbe39b32f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('fortresses', sa.Column(
+        'search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True,
+    ))
+    op.create_index('ix_fortresses_search_vector', 'fortresses', ['search_vector'], postgresql_using='gin')
+    op.create_index(
+        'ix_fortresses_name_trgm', 'fortresses', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_fortresses_name_trgm', table_name='fortresses')
+    op.drop_index('ix_fortresses_search_vector', table_name='fortresses')
+    op.drop_column('fortresses', 'search_vector')
@@ -0,0 +1,39 @@
+"""fortress list filters
+
+Revision ID: c4e1f7a2d9b3
+Revises: b6a3bca05829
+Create Date: 2026-10-17 16:40:12.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1f7a2d9b3'
+down_revision: Union[str, Sequence[str], None] = 'b6a3bca05829'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LIVE = sa.text('deleted_at IS NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_fortresses_city_id', 'fortresses', [sa.text('lower(city)'), 'id'], postgresql_where=LIVE)
+    op.create_index(
+        'ix_fortresses_style_id', 'fortresses', [sa.text('lower(architectural_style)'), 'id'], postgresql_where=LIVE,
+    )
+    op.create_index('ix_fortresses_year_id', 'fortresses', ['foundation_year', 'id'], postgresql_where=LIVE)
+    op.create_index('ix_fortresses_name_id', 'fortresses', ['name', 'id'], postgresql_where=LIVE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_fortresses_name_id', table_name='fortresses')
+    op.drop_index('ix_fortresses_year_id', table_name='fortresses')
+    op.drop_index('ix_fortresses_style_id', table_name='fortresses')
+    op.drop_index('ix_fortresses_city_id', table_name='fortresses')
@@ -0,0 +1,129 @@
+"""
+Бенчмарк отдачи списка кремлей: response_model против готовых байтов.
+
+Сравниваются два минимальных FastAPI-приложения с одним и тем же
+набором синтетических KremlinListItem:
+
+  model       — как раньше: хендлер возвращает list[KremlinListItem],
+                FastAPI валидирует его по response_model и сериализует;
+  prerendered — хендлер отдаёт готовые байты PrerenderedBody
+                (identity / gzip / br по Accept-Encoding).
+
+Запросы прогоняются напрямую через ASGI-интерфейс, без сети и БД, так
+что разница — это именно стоимость валидации/сериализации на запрос.
+
+Запуск (из каталога backend):
+  python -m benchmarks.bench_list_render
+  python -m benchmarks.bench_list_render --rows 10000 --requests 200
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from fastapi import FastAPI, Header, Response
+from pydantic import TypeAdapter
+from typing import Optional
+
+from app.core.prerender import PrerenderedBody
+from app.schemas import KremlinListItem, KremlinLocation
+
+
+def synthetic_items(rows: int) -> list[KremlinListItem]:
+    rnd = random.Random(42)
+    return [
+        KremlinListItem(
+            id=i,
+            name=f"Кремль №{i}",
+            location=KremlinLocation(lat=rnd.uniform(41.0, 70.0), lon=rnd.uniform(20.0, 180.0)),
+            previewImageUrl=f"https://commons.wikimedia.org/wiki/Special:FilePath/Kremlin_{i}.jpg",
+            city=f"Город {i % 500}",
+            yearBuilt=rnd.randint(1000, 1700),
+        )
+        for i in range(1, rows + 1)
+    ]
+
+
+def build_apps(items: list[KremlinListItem]) -> tuple[FastAPI, FastAPI]:
+    model_app = FastAPI()
+
+    @model_app.get("/api/kremlins", response_model=list[KremlinListItem])
+    async def list_model() -> list[KremlinListItem]:
+        return items
+
+    body = PrerenderedBody.render(TypeAdapter(list[KremlinListItem]).dump_json(items), etag='"bench"')
+    prerendered_app = FastAPI()
+
+    @prerendered_app.get("/api/kremlins")
+    async def list_prerendered(accept_encoding: Optional[str] = Header(default=None)) -> Response:
+        content, encoding, etag = body.pick(accept_encoding)
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=content, media_type="application/json", headers=headers)
+
+    return model_app, prerendered_app
+
+
+async def asgi_get(app, path: str, accept_encoding: Optional[str]) -> int:
+    """Один GET через ASGI; возвращает размер тела ответа."""
+    headers = [(b"host", b"bench")]
+    if accept_encoding:
+        headers.append((b"accept-encoding", accept_encoding.encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def measure(app, requests: int, accept_encoding: Optional[str]) -> tuple[float, float, int]:
+    await asgi_get(app, "/api/kremlins", accept_encoding)  # прогрев
+    latencies = []
+    size = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        size = await asgi_get(app, "/api/kremlins", accept_encoding)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return mean * 1000, p99 * 1000, size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000", help="размеры списка через запятую")
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'path':<12} {'encoding':<9} {'mean ms':>9} {'p99 ms':>9} {'bytes':>10}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        model_app, prerendered_app = build_apps(synthetic_items(rows))
+        runs = [
+            ("model", model_app, None),
+            ("prerendered", prerendered_app, None),
+            ("prerendered", prerendered_app, "gzip"),
+            ("prerendered", prerendered_app, "gzip, br"),
+        ]
+        for name, app, encoding in runs:
+            mean, p99, size = await measure(app, args.requests, encoding)
+            label = {None: "identity", "gzip": "gzip", "gzip, br": "br"}[encoding]
+            print(f"{rows:>7} {name:<12} {label:<9} {mean:>9.3f} {p99:>9.3f} {size:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Бенчмарк: латентность GET во время шквала логинов.
+
+Против запущенного сервера (uvicorn app.main:app) выполняются две фазы:
+
+  1. baseline — только GET-запросы (по умолчанию /api/kremlins/1);
+  2. login storm — те же GET, пока N потоков непрерывно логинятся
+     (верный пароль — каждая попытка стоит полного pbkdf2).
+
+Печатаются p50/p99/max латентности GET и распределение статусов
+логина. Хэширование идёт в отдельном пуле процессов с контролем
+допуска, поэтому p99 GET во второй фазе должен остаться близким к
+baseline, а лишние логины — получать 503 с Retry-After.
+
+Запуск (из каталога backend, сервер и БД уже запущены):
+  python -m benchmarks.bench_login_storm --base-url http://localhost:8000
+  python -m benchmarks.bench_login_storm --logins 64 --duration 20
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+from benchmarks.bench_upload_latency import http, measure_gets, report
+
+
+def register(base_url: str) -> tuple[str, str]:
+    """Регистрирует одноразового пользователя; возвращает (email, пароль)."""
+    suffix = uuid.uuid4().hex[:8]
+    email, password = f"storm_{suffix}@example.com", "storm-password"
+    body = json.dumps({"username": f"storm_{suffix}", "email": email, "password": password}).encode()
+    status, data = http("POST", f"{base_url}/api/auth/register", body, {"Content-Type": "application/json"})
+    if status != 201:
+        raise SystemExit(f"Не удалось зарегистрировать пользователя: {status} {data[:200]!r}")
+    return email, password
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--get-path", default="/api/kremlins/1")
+    parser.add_argument("--logins", type=int, default=32, help="потоков, непрерывно выполняющих логин")
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    get_url = args.base_url + args.get_path
+    report("baseline", measure_gets(get_url, args.duration))
+
+    email, password = register(args.base_url)
+    body = json.dumps({"email": email, "password": password}).encode()
+    login_url = f"{args.base_url}/api/auth/login"
+    headers = {"Content-Type": "application/json"}
+
+    stop = threading.Event()
+    statuses: dict[int, int] = {}
+    lock = threading.Lock()
+
+    def login_loop():
+        while not stop.is_set():
+            status, _ = http("POST", login_url, body, headers)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(args.logins)]
+    for t in threads:
+        t.start()
+    time.sleep(1.0)  # даём шквалу разогнаться
+    latencies = measure_gets(get_url, args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    report("login storm", latencies)
+    total = sum(statuses.values())
+    print(f"logins: {total} попыток ({total / (args.duration + 1):.1f}/с), статусы {statuses}")
+
+
+if __name__ == "__main__":
+    main()
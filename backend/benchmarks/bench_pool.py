@@ -0,0 +1,93 @@
+"""
+Бенчмарк пула соединений: пропускная способность при 50/200/1000
+одновременных клиентах.
+
+Движок создаётся так же, как `app.database.async_engine`
+(create_async_engine + engine_pool_kwargs, asyncpg). Каждый клиент —
+asyncio-задача, которая в цикле берёт соединение из пула и выполняет
+короткий запрос (по умолчанию `SELECT pg_sleep(0.002)`, имитация лёгкого
+эндпоинта). По итогам каждого уровня печатаются запросы/сек, p50/p99
+латентности и метрики пула.
+
+Запуск (из каталога backend, БД должна быть доступна по ASYNC_DATABASE_URL):
+  python -m benchmarks.bench_pool
+  DB_POOL_SIZE=20 DB_MAX_OVERFLOW=0 python -m benchmarks.bench_pool --duration 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.pool import engine_pool_kwargs, pool_stats
+from app.database import ASYNC_DATABASE_URL, DB_ERRORS
+
+
+async def run_level(engine, clients: int, duration: float, query: str) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+    stmt = text(query)
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(stmt)
+            except DB_ERRORS:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    p99_index = max(0, int(len(latencies) * 0.99) - 1)
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[p99_index] * 1000 if latencies else 0.0,
+        "pool": pool_stats(engine),
+    }
+
+
+async def run(levels: list[int], duration: float, query: str) -> None:
+    kwargs = engine_pool_kwargs()
+    print(
+        f"pool_size={kwargs['pool_size']} max_overflow={kwargs['max_overflow']} "
+        f"timeout={kwargs['pool_timeout']}s pre_ping={kwargs['pool_pre_ping']} lifo={kwargs['pool_use_lifo']}"
+    )
+    print(f"{'clients':>8} {'req':>8} {'err':>6} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'wait max ms':>12} {'timeouts':>9}")
+    for level in levels:
+        # Новый движок на каждый уровень — чтобы метрики пула не смешивались
+        engine = create_async_engine(ASYNC_DATABASE_URL, **kwargs)
+        try:
+            r = await run_level(engine, level, duration, query)
+        finally:
+            await engine.dispose()
+        print(
+            f"{r['clients']:>8} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['pool']['waitMaxMs']:>12.2f} {r['pool']['timeouts']:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="50,200,1000", help="уровни конкурентности через запятую")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на каждый уровень")
+    parser.add_argument("--query", default="SELECT pg_sleep(0.002)")
+    args = parser.parse_args()
+    asyncio.run(run([int(c) for c in args.clients.split(",")], args.duration, args.query))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Бенчмарк: латентность обычных GET во время интенсивной загрузки фото.
+
+Против запущенного сервера (uvicorn app.main:app) выполняются две фазы:
+
+  1. baseline — только GET-запросы (по умолчанию /api/kremlins/1);
+  2. under load — те же GET, пока N потоков непрерывно отправляют
+     комментарии с несколькими крупными изображениями.
+
+Для каждой фазы печатаются p50/p99/max латентности GET. Если запись
+файлов блокирует event loop, p99 во второй фазе растёт на порядки.
+
+Запуск (из каталога backend, сервер уже запущен):
+  python -m benchmarks.bench_upload_latency --base-url http://localhost:8000
+  python -m benchmarks.bench_upload_latency --uploaders 16 --file-mb 8 --files 3
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+
+def http(method: str, url: str, body: bytes = None, headers: dict = None) -> tuple[int, bytes]:
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def get_token(base_url: str) -> str:
+    """Регистрирует одноразового пользователя и возвращает его токен."""
+    suffix = uuid.uuid4().hex[:8]
+    body = json.dumps({
+        "username": f"bench_{suffix}", "email": f"bench_{suffix}@example.com", "password": "bench-password",
+    }).encode()
+    status, data = http("POST", f"{base_url}/api/auth/register", body, {"Content-Type": "application/json"})
+    if status != 201:
+        raise SystemExit(f"Не удалось зарегистрировать пользователя: {status} {data[:200]!r}")
+    return json.loads(data)["accessToken"]
+
+
+def multipart(files: list[bytes]) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = [
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"text\"\r\n\r\nbench\r\n".encode()
+    ]
+    for i, data in enumerate(files):
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"images\"; filename=\"bench{i}.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, int(len(sorted_values) * p) - 1)]
+
+
+def measure_gets(url: str, duration: float) -> list[float]:
+    latencies = []
+    stop_at = time.perf_counter() + duration
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        http("GET", url)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    print(
+        f"{name:<12} n={len(latencies):<6} p50={percentile(latencies, 0.5) * 1000:8.2f}ms "
+        f"p99={percentile(latencies, 0.99) * 1000:8.2f}ms max={(latencies[-1] if latencies else 0) * 1000:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--get-path", default="/api/kremlins/1")
+    parser.add_argument("--kremlin-id", type=int, default=1)
+    parser.add_argument("--uploaders", type=int, default=8)
+    parser.add_argument("--files", type=int, default=3, help="файлов в одном комментарии")
+    parser.add_argument("--file-mb", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    get_url = args.base_url + args.get_path
+    report("baseline", measure_gets(get_url, args.duration))
+
+    token = get_token(args.base_url)
+    body, content_type = multipart([os.urandom(int(args.file_mb * 1024 * 1024)) for _ in range(args.files)])
+    upload_url = f"{args.base_url}/api/kremlins/{args.kremlin_id}/comments"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": content_type}
+
+    stop = threading.Event()
+    uploaded = [0]
+    statuses: dict[int, int] = {}
+    lock = threading.Lock()
+
+    def uploader():
+        while not stop.is_set():
+            status, _ = http("POST", upload_url, body, headers)
+            with lock:
+                uploaded[0] += 1
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=uploader, daemon=True) for _ in range(args.uploaders)]
+    for t in threads:
+        t.start()
+    time.sleep(1.0)  # даём загрузкам разогнаться
+    latencies = measure_gets(get_url, args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    report("under load", latencies)
+    mb = uploaded[0] * args.files * args.file_mb
+    print(f"uploads: {uploaded[0]} комментариев, {mb:.0f} МиБ, статусы {statuses}")
+
+
+if __name__ == "__main__":
+    main()
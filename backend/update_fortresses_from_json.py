@@ -1,7 +1,18 @@
 """Обновляет строки в таблице `fortresses` данными из
 `frontend/query_kremlins.json`.
 Сопоставление делаем по координатам (lon,lat) с небольшой толерантностью.
+
+Все точки JSON загружаются во временную таблицу одним COPY,
+сопоставление — один пространственный JOIN (ST_DWithin по GiST-индексу),
+запись — один UPDATE ... FROM. Точки без пары и неоднозначные пары (точка рядом с
+несколькими кремлями или кремль рядом с несколькими точками)
+не обновляются и выводятся в отчёте.
+
+  python update_fortresses_from_json.py --tolerance-m 2
 """
+import argparse
+import csv
+import io
 import json
 from pathlib import Path
 from app.database import engine
@@ -10,17 +21,24 @@ from sqlalchemy import text
 base = Path(__file__).resolve().parents[1]
 local_path = base / 'frontend' / 'query_kremlins.json'
 
-if not local_path.exists():
-    raise FileNotFoundError(f"Expected data file not found: {local_path}")
+# ~ прежнее сравнение координат, округлённых до 5 знаков
+DEFAULT_TOLERANCE_M = 2.0
+
 
-with open(local_path, 'r', encoding='utf-8') as fh:
-    data = json.load(fh)
+def load_points(path: Path) -> list[dict]:
+    """Точки из JSON: [{idx, lon, lat, wikidata_id, label}]."""
+    if not path.exists():
+        raise FileNotFoundError(f"Expected data file not found: {path}")
 
-# build mapping coord -> wikidataId
-mapping = []
-for it in data:
-    coord = it.get('coord')
-    if coord and coord.startswith('Point('):
+    with open(path, 'r', encoding='utf-8') as fh:
+        data = json.load(fh)
+
+    points = []
+    for idx, it in enumerate(data):
+        coord = it.get('coord')
+        wid = it.get('wikidataId')
+        if not wid or not coord or not coord.startswith('Point('):
+            continue
         inner = coord.replace('Point(', '').replace(')', '')
         parts = inner.split()
         try:
@@ -28,29 +46,128 @@ for it in data:
             lat = float(parts[1])
         except Exception:
             continue
-        mapping.append((lon, lat, it.get('wikidataId')))
+        points.append({"idx": idx, "lon": lon, "lat": lat, "wikidata_id": wid, "label": it.get('itemLabel')})
+    return points
 
-with engine.begin() as conn:
-    updated = 0
-    for lon, lat, wid in mapping:
-        if not wid:
-            continue
-        q = text("SELECT id, ST_X(location) AS lon, ST_Y(location) AS lat FROM fortresses")
-        rows = conn.execute(q).mappings().all()
-        target = None
-        for r in rows:
-            rl = r['lon']
-            ra = r['lat']
-            if rl is None or ra is None:
-                continue
-            if round(rl,5) == round(lon,5) and round(ra,5) == round(lat,5):
-                target = r['id']
-                break
-        if target:
-            uq = text("UPDATE fortresses SET wikidata_id = :wid WHERE id = :id")
-            conn.execute(uq, {"wid": wid, "id": target})
-            updated += 1
-
-print(f'Обновлено записей с wikidata_id: {updated}')
+
+def _points_csv(points: list[dict]) -> io.StringIO:
+    """CSV для COPY json_points; геометрия — EWKT, PostGIS разбирает её при вводе."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for p in points:
+        writer.writerow([p["idx"], p["wikidata_id"], p["label"], f"SRID=4326;POINT({p['lon']!r} {p['lat']!r})"])
+    buf.seek(0)
+    return buf
+
+
+def match_and_update(points: list[dict], tolerance_m: float) -> dict:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TEMP TABLE json_points (
+                idx integer PRIMARY KEY,
+                wikidata_id text NOT NULL,
+                label text,
+                geom geometry(Point, 4326) NOT NULL
+            ) ON COMMIT DROP
+        """))
+        if points:
+            # COPY — один поток данных вместо INSERT на каждую точку (executemany)
+            conn.connection.cursor().copy_expert(
+                "COPY json_points (idx, wikidata_id, label, geom) FROM STDIN WITH (FORMAT csv)",
+                _points_csv(points),
+            )
+
+        # Все пары (точка, кремль) в пределах допуска: сначала прямоугольник
+        # по индексу (градусы долготы растянуты на широте точки), затем
+        # точное расстояние на сфероиде
+        conn.execute(text("""
+            CREATE TEMP TABLE point_candidates ON COMMIT DROP AS
+            SELECT p.idx, p.wikidata_id, f.id AS fortress_id
+            FROM json_points p
+            JOIN fortresses f
+              ON f.deleted_at IS NULL
+             AND f.location && ST_Expand(p.geom, :tol / 111320.0 / greatest(cos(radians(ST_Y(p.geom))), 0.01))
+             AND ST_DWithin(f.location::geography, p.geom::geography, :tol)
+        """), {"tol": tolerance_m})
+
+        # Однозначные пары: у точки ровно один кремль, у кремля ровно одна точка,
+        # wikidata_id встречается в одной паре и не принадлежит другому кремлю
+        # (уникальный индекс ux_fortresses_wikidata_id)
+        conn.execute(text("""
+            CREATE TEMP TABLE point_matches ON COMMIT DROP AS
+            SELECT c.idx, c.wikidata_id, c.fortress_id
+            FROM (
+                SELECT idx, wikidata_id, fortress_id,
+                       count(*) OVER (PARTITION BY idx) AS per_point,
+                       count(*) OVER (PARTITION BY fortress_id) AS per_fortress,
+                       count(*) OVER (PARTITION BY wikidata_id) AS per_wikidata_id
+                FROM point_candidates
+            ) c
+            WHERE c.per_point = 1 AND c.per_fortress = 1 AND c.per_wikidata_id = 1
+              AND NOT EXISTS (
+                  SELECT 1 FROM fortresses f
+                  WHERE f.wikidata_id = c.wikidata_id AND f.id <> c.fortress_id
+              )
+        """))
+
+        to_update = conn.execute(text("""
+            SELECT count(*) FROM point_matches m
+            JOIN fortresses f ON f.id = m.fortress_id
+            WHERE f.wikidata_id IS DISTINCT FROM m.wikidata_id
+        """)).scalar()
+        updated = 0
+        # Лишний UPDATE без строк всё равно сдвинул бы версию набора данных
+        if to_update:
+            updated = conn.execute(text("""
+                UPDATE fortresses f SET wikidata_id = m.wikidata_id
+                FROM point_matches m
+                WHERE f.id = m.fortress_id AND f.wikidata_id IS DISTINCT FROM m.wikidata_id
+            """)).rowcount
+
+        matched = conn.execute(text("SELECT count(*) FROM point_matches")).scalar()
+        unmatched = conn.execute(text("""
+            SELECT p.idx, p.wikidata_id, p.label, ST_X(p.geom) AS lon, ST_Y(p.geom) AS lat
+            FROM json_points p
+            WHERE NOT EXISTS (SELECT 1 FROM point_candidates c WHERE c.idx = p.idx)
+            ORDER BY p.idx
+        """)).mappings().all()
+        ambiguous = conn.execute(text("""
+            SELECT p.idx, p.wikidata_id, p.label, array_agg(c.fortress_id ORDER BY c.fortress_id) AS fortress_ids
+            FROM json_points p
+            JOIN point_candidates c ON c.idx = p.idx
+            WHERE NOT EXISTS (SELECT 1 FROM point_matches m WHERE m.idx = p.idx)
+            GROUP BY p.idx, p.wikidata_id, p.label
+            ORDER BY p.idx
+        """)).mappings().all()
+
+    return {
+        "points": len(points),
+        "matched": matched,
+        "updated": updated,
+        "unmatched": unmatched,
+        "ambiguous": ambiguous,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проставляет wikidata_id кремлям по координатам из query_kremlins.json")
+    parser.add_argument("--file", type=Path, default=local_path)
+    parser.add_argument("--tolerance-m", type=float, default=DEFAULT_TOLERANCE_M, help="допуск совпадения координат, м")
+    args = parser.parse_args()
+
+    report = match_and_update(load_points(args.file), args.tolerance_m)
+
+    print(
+        f"Точек: {report['points']}, сопоставлено однозначно: {report['matched']}, "
+        f"без пары: {len(report['unmatched'])}, неоднозначных или с занятым wikidata_id: {len(report['ambiguous'])}."
+    )
+    for r in report['unmatched']:
+        print(f"  без пары: {r['wikidata_id']} {r['label']!r} ({r['lon']:.6f} {r['lat']:.6f})")
+    for r in report['ambiguous']:
+        ids = ", ".join(map(str, r['fortress_ids']))
+        print(f"  неоднозначно: {r['wikidata_id']} {r['label']!r} -> кремли {ids}")
+    print(f'Обновлено записей с wikidata_id: {report["updated"]}')
 
 
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
 import { api } from '../lib/api'
-import type { Comment, CreateCommentPayload } from '../types'
+import type { Comment, CommentPage, CreateCommentPayload } from '../types'
 
-export const getComments = (kremlinId: number): Promise<Comment[]> =>
-  api.get(`kremlins/${kremlinId}/comments`).json()
+export const getComments = (
+  kremlinId: number,
+  cursor?: string | null,
+  limit?: number,
+): Promise<CommentPage> =>
+  api
+    .get(`kremlins/${kremlinId}/comments`, {
+      searchParams: {
+        ...(cursor ? { cursor } : {}),
+        ...(limit ? { limit } : {}),
+      },
+    })
+    .json()
 
 export const createComment = (
   kremlinId: number,
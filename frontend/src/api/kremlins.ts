@@ -1,8 +1,46 @@
 import { api } from '../lib/api'
-import type { KremlinListItem, KremlinDetail } from '../types'
+import type {
+  KremlinListItem,
+  KremlinListPage,
+  KremlinListQuery,
+  KremlinDetail,
+  KremlinBatch,
+  KremlinCluster,
+  KremlinSearchResult,
+} from '../types'
 
 export const getKremlins = (): Promise<KremlinListItem[]> =>
   api.get('kremlins').json()
 
+export const getKremlinsPage = async (query: KremlinListQuery): Promise<KremlinListPage> => {
+  const searchParams = Object.fromEntries(
+    Object.entries(query).filter(([, value]) => value !== undefined && value !== null && value !== ''),
+  ) as Record<string, string | number | boolean>
+  const response = await api.get('kremlins', { searchParams })
+  return {
+    items: await response.json<KremlinListItem[]>(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  }
+}
+
 export const getKremlin = (id: number): Promise<KremlinDetail> =>
   api.get(`kremlins/${id}`).json()
+
+export const getKremlinsBatch = (ids: number[]): Promise<KremlinBatch> =>
+  api.post('kremlins/batch', { json: { ids } }).json()
+
+export const getKremlinClusters = (
+  zoom: number,
+  bbox?: [number, number, number, number],
+): Promise<KremlinCluster[]> =>
+  api
+    .get('kremlins/clusters', {
+      searchParams: bbox ? { zoom, bbox: bbox.join(',') } : { zoom },
+    })
+    .json()
+
+export const searchKremlins = (q: string, limit = 20): Promise<KremlinSearchResult[]> =>
+  api.get('kremlins/search', { searchParams: { q, limit } }).json()
+
+export const suggestKremlins = (prefix: string, limit = 10): Promise<KremlinListItem[]> =>
+  api.get('kremlins/suggest', { searchParams: { prefix, limit } }).json()
@@ -1,9 +1,12 @@
-import { useQuery } from '@tanstack/react-query'
+import { useInfiniteQuery } from '@tanstack/react-query'
 import { getComments } from '../api/comments'
 
 export const useComments = (kremlinId: number) =>
-  useQuery({
+  useInfiniteQuery({
     queryKey: ['comments', kremlinId],
-    queryFn: () => getComments(kremlinId),
+    queryFn: ({ pageParam }) => getComments(kremlinId, pageParam),
+    initialPageParam: null as string | null,
+    getNextPageParam: (page) => page.nextCursor,
+    select: (data) => data.pages.flatMap((page) => page.items),
     enabled: !!kremlinId,
   })
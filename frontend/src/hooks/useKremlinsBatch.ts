@@ -0,0 +1,9 @@
+import { useQuery } from '@tanstack/react-query'
+import { getKremlinsBatch } from '../api/kremlins'
+
+export const useKremlinsBatch = (ids: number[]) =>
+  useQuery({
+    queryKey: ['kremlins', 'batch', ids],
+    queryFn: () => getKremlinsBatch(ids),
+    enabled: ids.length > 0,
+  })
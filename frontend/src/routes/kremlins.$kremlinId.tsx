@@ -113,7 +113,7 @@ function KremlinPage() {
       )}
 
       {/* Комментарии */}
-      <CommentSection kremlinId={id} />
+      <CommentSection kremlinId={id} commentsCount={data.commentsCount} />
     </div>
   )
 }
@@ -136,14 +136,26 @@ function getInitial(name: string): string {
 // CommentSection
 // ---------------------------------------------------------------------------
 
-function CommentSection({ kremlinId }: { kremlinId: number }) {
-  const { data: comments = [], isLoading } = useComments(kremlinId)
+function CommentSection({
+  kremlinId,
+  commentsCount,
+}: {
+  kremlinId: number
+  commentsCount: number
+}) {
+  const {
+    data: comments = [],
+    isLoading,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useComments(kremlinId)
   const { isAuthenticated } = useAuthStore()
 
   return (
     <section className="mt-10 border-t border-gray-100 pt-8">
       <h2 className="mb-6 text-xl font-semibold text-gray-900">
-        Комментарии{comments.length > 0 && ` (${comments.length})`}
+        Комментарии{commentsCount > 0 && ` (${commentsCount})`}
       </h2>
 
       {isAuthenticated ? (
@@ -164,11 +176,25 @@ function CommentSection({ kremlinId }: { kremlinId: number }) {
           Комментариев пока нет. Будьте первым!
         </p>
       ) : (
-        <ul className="space-y-6">
-          {comments.map((comment) => (
-            <CommentItem key={comment.id} comment={comment} />
-          ))}
-        </ul>
+        <>
+          <ul className="space-y-6">
+            {comments.map((comment) => (
+              <CommentItem key={comment.id} comment={comment} />
+            ))}
+          </ul>
+          {hasNextPage && (
+            <div className="mt-6 text-center">
+              <button
+                type="button"
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+                className="rounded-lg px-4 py-2 text-sm font-medium text-red-600 hover:bg-red-50 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
+              >
+                {isFetchingNextPage ? 'Загрузка...' : 'Показать ещё'}
+              </button>
+            </div>
+          )}
+        </>
       )}
     </section>
   )
@@ -237,6 +263,7 @@ function CommentForm({ kremlinId }: { kremlinId: number }) {
     mutationFn: () => createComment(kremlinId, { text, images: files }),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['comments', kremlinId] })
+      queryClient.invalidateQueries({ queryKey: ['kremlin', kremlinId] })
       setText('')
       setFiles([])
       setPreviews([])
@@ -1,3 +1,5 @@
+import type { ImageVariants } from './kremlin'
+
 export interface Comment {
   id: number
   kremlinId: number
@@ -6,6 +8,7 @@ export interface Comment {
   authorAvatarUrl: string | null
   text: string
   imageUrls: string[]
+  imageVariants: ImageVariants[]
   createdAt: string
 }
 
@@ -13,3 +16,8 @@ export interface CreateCommentPayload {
   text: string
   images?: File[]
 }
+
+export interface CommentPage {
+  items: Comment[]
+  nextCursor: string | null
+}
@@ -3,6 +3,12 @@ export interface KremlinLocation {
   lon: number
 }
 
+export interface ImageVariants {
+  original: string
+  thumb: string
+  medium: string
+}
+
 export interface KremlinListItem {
   id: number
   name: string
@@ -17,5 +23,40 @@ export interface KremlinDetail extends KremlinListItem {
   wikipediaUrl: string | null
   wikidataId: string | null
   images: string[]
+  imageVariants: ImageVariants[]
   commentsCount: number
 }
+
+export interface KremlinCluster {
+  count: number
+  location: KremlinLocation
+  kremlinId: number | null
+  bounds: [number, number, number, number] | null
+}
+
+export interface KremlinSearchResult extends KremlinListItem {
+  rank: number
+}
+
+export type KremlinListSort = 'id' | '-id' | 'name' | '-name' | 'yearBuilt' | '-yearBuilt'
+
+export interface KremlinListQuery {
+  city?: string
+  yearFrom?: number
+  yearTo?: number
+  architecturalStyle?: string
+  hasImage?: boolean
+  sort?: KremlinListSort
+  limit?: number
+  cursor?: string | null
+}
+
+export interface KremlinListPage {
+  items: KremlinListItem[]
+  nextCursor: string | null
+}
+
+export interface KremlinBatch {
+  items: KremlinDetail[]
+  missing: number[]
+}
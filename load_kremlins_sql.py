@@ -1,12 +1,40 @@
+"""
+Загрузка кремлей из Wikidata в таблицу fortresses.
+
+Режимы записи (--mode):
+  upsert (по умолчанию) — инкрементальная синхронизация по wikidata_id:
+         входящие записи сравниваются с таблицей, в БД уходят только
+         новые (INSERT), изменившиеся (UPDATE) и пропавшие из Wikidata
+         (мягкое удаление, deleted_at). id и комментарии сохраняются;
+         если ничего не изменилось, в БД не пишется ничего и версия
+         набора данных не меняется;
+  copy   — полная перезагрузка: записи пачками по COPY_BATCH_SIZE
+         отправляются через COPY во временную staging-таблицу, затем в
+         одной транзакции TRUNCATE fortresses и INSERT ... SELECT из staging
+         (комментарии удаляются вместе с кремлями);
+  insert — полная перезагрузка построчным INSERT (для сравнения).
+
+--reset пересоздаёт все таблицы (drop_all/create_all) перед загрузкой.
+
+--synthetic N вместо запроса к Wikidata генерирует N случайных записей,
+чтобы проверить скорость загрузки:
+  python load_kremlins_sql.py --synthetic 100000
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
 import requests
 import re
 from sqlalchemy import text
 
 from app.database import Base, engine
 import app.models  # важно для регистрации моделей
-
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+from wiki_enrichment import enrich_descriptions
 
 FAST_QUERY = """
 SELECT DISTINCT ?item ?itemLabel ?coord ?image ?desc ?article WHERE {
@@ -23,6 +51,8 @@ SELECT DISTINCT ?item ?itemLabel ?coord ?image ?desc ?article WHERE {
 LIMIT 1000
 """
 
+COPY_BATCH_SIZE = 50_000
+
 TRASH_WORDS = [
     "атака", "беспилотник", "завод", "церковь",
     "собор", "здание", "пожар", "дворец", "гора"
@@ -42,7 +72,26 @@ def parse_point(point_str: str):
     return lon, lat
 
 
-def sync_data():
+@dataclass
+class FortressRecord:
+    name: str
+    lon: float
+    lat: float
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+    foundation_year: Optional[int] = None
+    city: Optional[str] = None
+    wikipedia_url: Optional[str] = None
+    wikidata_id: Optional[str] = None
+
+
+FORTRESS_COLUMNS = [
+    "name", "lon", "lat", "description", "image_url",
+    "foundation_year", "city", "wikipedia_url", "wikidata_id",
+]
+
+
+def fetch_bindings() -> Optional[list[dict]]:
     url = "https://query.wikidata.org/sparql"
     headers = {
         "User-Agent": "CremlinsOfRussia/1.0",
@@ -55,112 +104,352 @@ def sync_data():
         r.raise_for_status()
         raw_items = r.json()["results"]["bindings"]
         print(f"Получено из сети: {len(raw_items)} записей.")
+        return raw_items
     except Exception as e:
         print("Ошибка сети:", e)
-        return
+        return None
+
+
+def parse_binding(row: dict) -> Optional[FortressRecord]:
+    """Одна строка SPARQL-ответа -> запись (None, если строка отбрасывается)."""
+    name = row.get("itemLabel", {}).get("value")
+    coord = row.get("coord", {}).get("value")
+
+    if not name or not coord:
+        return None
+
+    name_lower = name.lower()
+    if any(w in name_lower for w in TRASH_WORDS):
+        return None
+
+    lon, lat = parse_point(coord)
+    if lon is None or lat is None:
+        return None
+
+    clean_name = name.split("(")[0].strip()
+
+    desc_val = row.get("desc") or None
+    description = desc_val.get("value") if isinstance(desc_val, dict) else None
+
+    img_val = row.get("image") or None
+    image_url = img_val.get("value") if isinstance(img_val, dict) else None
+    if not image_url:
+        # Фильтр hasImage в API считает такой URL отсутствием фото
+        # (PLACEHOLDER_IMAGE_PREFIX в routers/kremlins.py)
+        image_url = "https://placehold.co/600x400?text=Kremlin"
+    else:
+        if image_url.startswith('http://'):
+            image_url = 'https://' + image_url[len('http://'):]
+
+    article_val = row.get("article") or None
+    wikipedia_url = article_val.get("value") if isinstance(article_val, dict) else None
+    if wikipedia_url and wikipedia_url.startswith('http://'):
+        wikipedia_url = 'https://' + wikipedia_url[len('http://'):]
+
+    # Wikidata id string (e.g. Q5110)
+    wikidata_id = None
+    item_val = row.get("item") or None
+    if isinstance(item_val, dict):
+        # item value is like 'http://www.wikidata.org/entity/Q5110'
+        it = item_val.get("value", "")
+        wikidata_id = it.rsplit('/', 1)[-1] if '/' in it else None
+
+    return FortressRecord(
+        name=clean_name,
+        lon=lon,
+        lat=lat,
+        description=description,
+        image_url=image_url,
+        wikipedia_url=wikipedia_url,
+        wikidata_id=wikidata_id,
+    )
+
+
+def parse_bindings(raw_items: list[dict]) -> list[FortressRecord]:
+    """Записи из SPARQL-ответа, по одной на wikidata_id.
+
+    SPARQL отдаёт объект несколько раз, если у него несколько координат,
+    фото или статей; оставляем первую строку.
+    """
+    records: list[FortressRecord] = []
+    seen: set[str] = set()
+    for rec in map(parse_binding, raw_items):
+        if rec is None:
+            continue
+        if rec.wikidata_id:
+            if rec.wikidata_id in seen:
+                continue
+            seen.add(rec.wikidata_id)
+        records.append(rec)
+    return records
+
+
+def synthetic_records(n: int, seed: int = 0) -> list[FortressRecord]:
+    """N случайных записей в границах европейской части России."""
+    rnd = random.Random(seed)
+    return [
+        FortressRecord(
+            name=f"Синтетический кремль {i}",
+            lon=round(rnd.uniform(27.0, 60.0), 6),
+            lat=round(rnd.uniform(42.0, 68.0), 6),
+            description=f"Описание синтетического кремля номер {i}.",
+            image_url="https://placehold.co/600x400?text=Kremlin",
+            foundation_year=rnd.randint(1000, 1800),
+            city=f"Город {i % 1000}",
+            wikipedia_url=None,
+            wikidata_id=f"QSYN{i}",
+        )
+        for i in range(n)
+    ]
+
 
+def _batches(records: list[FortressRecord], size: int) -> Iterable[list[FortressRecord]]:
+    for i in range(0, len(records), size):
+        yield records[i:i + size]
+
+
+def _to_csv(batch: list[FortressRecord]) -> io.StringIO:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for rec in batch:
+        # None -> пустое поле без кавычек, COPY читает его как NULL
+        writer.writerow(["" if v is None else v for v in (getattr(rec, c) for c in FORTRESS_COLUMNS)])
+    buf.seek(0)
+    return buf
+
+
+def _copy_to_staging(conn, records: list[FortressRecord]) -> None:
+    """Временная таблица fortresses_staging (до конца транзакции), заполненная через COPY."""
+    conn.execute(text("""
+        CREATE TEMP TABLE fortresses_staging (
+            name text,
+            lon double precision,
+            lat double precision,
+            description text,
+            image_url text,
+            foundation_year integer,
+            city text,
+            wikipedia_url text,
+            wikidata_id text
+        ) ON COMMIT DROP
+    """))
+    cur = conn.connection.cursor()
+    copy_sql = f"COPY fortresses_staging ({', '.join(FORTRESS_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    for batch in _batches(records, COPY_BATCH_SIZE):
+        cur.copy_expert(copy_sql, _to_csv(batch))
+
+
+def load_copy(records: list[FortressRecord]) -> int:
+    """COPY во временную staging-таблицу и замена содержимого fortresses одной транзакцией.
+
+    Саму таблицу не подменяем через RENAME: на fortresses ссылаются
+    comments, висят триггеры версии и индексы. Триггер версии
+    срабатывает по разу на оператор, а не на строку.
+
+    Полупустую таблицу никто не увидит, но TRUNCATE берёт ACCESS
+    EXCLUSIVE: до конца транзакции блокируются и читатели fortresses.
+    Поэтому COPY в staging идёт до TRUNCATE — блокировка держится только
+    на время INSERT ... SELECT. CASCADE очищает и comments. Для живой
+    базы — load_upsert.
+    """
     with engine.begin() as conn:
+        _copy_to_staging(conn, records)
         conn.execute(text("TRUNCATE TABLE fortresses RESTART IDENTITY CASCADE;"))
+        result = conn.execute(text("""
+            INSERT INTO fortresses (
+                name, location, description, image_url, foundation_year,
+                city, wikipedia_url, wikidata_id, comments_count
+            )
+            SELECT
+                name, ST_SetSRID(ST_MakePoint(lon, lat), 4326), description, image_url, foundation_year,
+                city, wikipedia_url, wikidata_id, 0
+            FROM fortresses_staging
+        """))
+        return result.rowcount
 
-        added = 0
 
-        for row in raw_items:
-            name = row.get("itemLabel", {}).get("value")
-            coord = row.get("coord", {}).get("value")
+# Колонки, которые синхронизация берёт из Wikidata (остальные — например,
+# architectural_style — правятся вручную и при синхронизации не трогаются)
+SYNC_COLUMNS = ["name", "lon", "lat", "description", "image_url", "wikipedia_url"]
 
-            if not name or not coord:
-                continue
 
-            name_lower = name.lower()
-            if any(w in name_lower for w in TRASH_WORDS):
-                continue
+def _sync_value(column: str, value):
+    # координаты сравниваются с точностью ~1 см
+    return round(value, 7) if column in ("lon", "lat") and value is not None else value
 
-            lon, lat = parse_point(coord)
-            if lon is None or lat is None:
-                continue
 
-            clean_name = name.split("(")[0].strip()
+# Колонки, где NULL во входных данных значит «не удалось получить» (сбой
+# запроса к Википедии), а не «стёрто»: остаётся сохранённое значение
+KEEP_ON_NULL_COLUMNS = {"description"}
+
+
+def _record_values(rec: FortressRecord, row=None) -> tuple:
+    """Значения записи для сравнения со строкой row (с учётом KEEP_ON_NULL_COLUMNS)."""
+    values = []
+    for c in SYNC_COLUMNS:
+        value = getattr(rec, c)
+        if value is None and row is not None and c in KEEP_ON_NULL_COLUMNS:
+            value = row[c]
+        values.append(_sync_value(c, value))
+    return tuple(values)
+
+
+def _row_values(row) -> tuple:
+    return tuple(_sync_value(c, row[c]) for c in SYNC_COLUMNS)
+
 
-            desc_val = row.get("desc") or None
-            description = desc_val.get("value") if isinstance(desc_val, dict) else None
+def load_upsert(records: list[FortressRecord]) -> int:
+    """Инкрементальная синхронизация по wikidata_id.
 
-            img_val = row.get("image") or None
-            image_url = img_val.get("value") if isinstance(img_val, dict) else None
-            if not image_url:
-                image_url = "https://placehold.co/600x400?text=Kremlin"
+    Разница с таблицей считается в Python: оператор UPDATE/INSERT
+    выполняется, только если есть что менять. Поэтому повторная
+    синхронизация без изменений не пишет в БД и не сдвигает версию
+    набора данных (триггер срабатывает на каждый оператор, даже если он
+    не затронул ни одной строки). Новые и изменённые записи уходят одним
+    INSERT ... ON CONFLICT (wikidata_id) DO UPDATE из staging-таблицы.
+    Запись без description (описание не удалось получить) не затирает
+    сохранённое описание.
+    """
+    keyed = [rec for rec in records if rec.wikidata_id]
+    skipped = len(records) - len(keyed)
+
+    with engine.begin() as conn:
+        existing = {
+            row["wikidata_id"]: row
+            for row in conn.execute(text("""
+                SELECT id, wikidata_id, name, ST_X(location) AS lon, ST_Y(location) AS lat,
+                       description, image_url, wikipedia_url, deleted_at
+                FROM fortresses
+                WHERE wikidata_id IS NOT NULL
+            """)).mappings()
+        }
+
+        inserted, updated, revived, unchanged = [], [], [], 0
+        for rec in keyed:
+            row = existing.get(rec.wikidata_id)
+            if row is None:
+                inserted.append(rec)
+            elif row["deleted_at"] is not None:
+                revived.append(rec)
+            elif _row_values(row) != _record_values(rec, row):
+                updated.append(rec)
             else:
-                if image_url.startswith('http://'):
-                    image_url = 'https://' + image_url[len('http://'):]
-
-            article_val = row.get("article") or None
-            wikipedia_url = article_val.get("value") if isinstance(article_val, dict) else None
-            if wikipedia_url and wikipedia_url.startswith('http://'):
-                wikipedia_url = 'https://' + wikipedia_url[len('http://'):]
-
-            if not description and wikipedia_url:
-                try:
-                    if '/wiki/' in wikipedia_url:
-                        title = wikipedia_url.rsplit('/wiki/', 1)[1]
-                        wiki_api = f"https://ru.wikipedia.org/api/rest_v1/page/summary/{title}"
-                        rh = requests.get(wiki_api, headers={'User-Agent': 'Cremlins/1.0'}, timeout=10)
-                        if rh.status_code == 200:
-                            j = rh.json()
-                            desc = j.get('extract') or j.get('description')
-                            if desc:
-                                description = desc
-                except Exception:
-                    # ignore fetch errors — we'll keep None or the placeholder
-                    pass
-
-            # Wikidata id string (e.g. Q5110)
-            wikidata_id = None
-            item_val = row.get("item") or None
-            if isinstance(item_val, dict):
-                # item value is like 'http://www.wikidata.org/entity/Q5110'
-                it = item_val.get("value", "")
-                wikidata_id = it.rsplit('/', 1)[-1] if '/' in it else None
-
-            q = text("""
+                unchanged += 1
+        incoming = {rec.wikidata_id for rec in keyed}
+        deleted_ids = [
+            row["id"] for wid, row in existing.items()
+            if wid not in incoming and row["deleted_at"] is None
+        ]
+
+        changed = inserted + updated + revived
+        if changed:
+            _copy_to_staging(conn, changed)
+            conn.execute(text("""
                 INSERT INTO fortresses (
-                    name,
-                    location,
-                    description,
-                    image_url,
-                    foundation_year,
-                    city,
-                    wikipedia_url,
-                    wikidata_id,
-                    comments_count
+                    name, location, description, image_url, foundation_year,
+                    city, wikipedia_url, wikidata_id, comments_count
                 )
-                VALUES (
-                    :name,
-                    ST_SetSRID(ST_MakePoint(:lon, :lat), 4326),
-                    :description,
-                    :image_url,
-                    :foundation_year,
-                    :city,
-                    :wikipedia_url,
-                    :wikidata_id,
-                    0
-                )
-            """)
+                SELECT
+                    name, ST_SetSRID(ST_MakePoint(lon, lat), 4326), description, image_url, foundation_year,
+                    city, wikipedia_url, wikidata_id, 0
+                FROM fortresses_staging
+                ON CONFLICT (wikidata_id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    location = EXCLUDED.location,
+                    description = COALESCE(EXCLUDED.description, fortresses.description),
+                    image_url = EXCLUDED.image_url,
+                    wikipedia_url = EXCLUDED.wikipedia_url,
+                    deleted_at = NULL
+            """))
+        if deleted_ids:
+            conn.execute(
+                text("UPDATE fortresses SET deleted_at = now() WHERE id = ANY(:ids)"),
+                {"ids": deleted_ids},
+            )
+
+    print(
+        f"Синхронизация: добавлено {len(inserted)}, обновлено {len(updated)}, "
+        f"восстановлено {len(revived)}, удалено {len(deleted_ids)}, без изменений {unchanged}"
+        + (f", пропущено без wikidata_id {skipped}" if skipped else "") + "."
+    )
+    if not changed and not deleted_ids:
+        print("Изменений нет — версия набора данных не изменилась.")
+    return len(changed) + len(deleted_ids)
+
+
+def load_insert(records: list[FortressRecord]) -> int:
+    """Построчный INSERT (прежний режим)."""
+    q = text("""
+        INSERT INTO fortresses (
+            name,
+            location,
+            description,
+            image_url,
+            foundation_year,
+            city,
+            wikipedia_url,
+            wikidata_id,
+            comments_count
+        )
+        VALUES (
+            :name,
+            ST_SetSRID(ST_MakePoint(:lon, :lat), 4326),
+            :description,
+            :image_url,
+            :foundation_year,
+            :city,
+            :wikipedia_url,
+            :wikidata_id,
+            0
+        )
+    """)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE fortresses RESTART IDENTITY CASCADE;"))
+        for rec in records:
+            conn.execute(q, {c: getattr(rec, c) for c in FORTRESS_COLUMNS})
+    return len(records)
+
+
+LOADERS = {"upsert": load_upsert, "copy": load_copy, "insert": load_insert}
+
+
+def reset_schema() -> None:
+    """Пересоздаёт все таблицы. Удаляет пользователей и комментарии!"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
 
-            conn.execute(q, {
-                "name": clean_name,
-                "lon": lon,
-                "lat": lat,
-                "description": description,
-                "image_url": image_url,
-                "foundation_year": None,
-                "city": None,
-                "wikipedia_url": wikipedia_url,
-                "wikidata_id": wikidata_id,
-            })
+def sync_data(mode: str = "upsert", synthetic: Optional[int] = None, reset: bool = False):
+    if reset:
+        reset_schema()
+    started = time.perf_counter()
+    if synthetic is not None:
+        records = synthetic_records(synthetic)
+        print(f"Сгенерировано синтетических записей: {len(records)}.")
+    else:
+        raw_items = fetch_bindings()
+        if raw_items is None:
+            return
+        records = parse_bindings(raw_items)
+        # описания из Википедии — параллельно, с дисковым кэшем и до открытия транзакции
+        enrich_descriptions(records)
+    prepared = time.perf_counter()
 
-            added += 1
+    written = LOADERS[mode](records)
+    loaded = time.perf_counter()
 
-        print(f"Добавлено в базу: {added} кремлей.")
+    print(f"Записано в базу: {written} кремлей.")
+    load_time = loaded - prepared
+    print(
+        f"Время: подготовка {prepared - started:.2f} с, запись ({mode}) {load_time:.2f} с"
+        f" ({len(records) / load_time if load_time else 0:.0f} записей/с)."
+    )
 
 
 if __name__ == "__main__":
-    sync_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Загрузка кремлей из Wikidata в таблицу fortresses")
+    parser.add_argument("--mode", choices=sorted(LOADERS), default="upsert")
+    parser.add_argument("--reset", action="store_true", help="пересоздать все таблицы перед загрузкой (удаляет комментарии и пользователей)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="загрузить N синтетических записей вместо Wikidata")
+    args = parser.parse_args()
+    sync_data(mode=args.mode, synthetic=args.synthetic, reset=args.reset)
@@ -0,0 +1,219 @@
+"""
+Описания кремлей из Википедии (REST API page/summary) для загрузчика.
+
+Запросы идут параллельно (WIKI_CONCURRENCY потоков) через один
+requests.Session с пулом соединений. Ответы сохраняются в дисковый кэш
+WIKI_CACHE_DIR: файл на статью с номером ревизии и ETag ответа.
+
+  - запись моложе WIKI_CACHE_MAX_AGE секунд используется без запроса;
+  - более старая перепроверяется условным запросом If-None-Match:
+    304 — статья не менялась (ревизия та же), тело не скачивается;
+  - 200 — новая ревизия, кэш перезаписывается.
+
+Так повторная синхронизация скачивает только изменившиеся статьи.
+
+Базовый URL API задаётся WIKI_API_BASE, поэтому этап проверяется без
+сети на локальной заглушке:
+  python wiki_enrichment.py stub --port 8089
+  WIKI_API_BASE=http://localhost:8089 python load_kremlins_sql.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import quote, unquote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+WIKI_API_BASE = os.getenv("WIKI_API_BASE", "https://ru.wikipedia.org/api/rest_v1").rstrip("/")
+WIKI_CACHE_DIR = os.getenv("WIKI_CACHE_DIR", os.path.join("cache", "wiki"))
+WIKI_CACHE_MAX_AGE = float(os.getenv("WIKI_CACHE_MAX_AGE", str(24 * 3600)))
+WIKI_CONCURRENCY = int(os.getenv("WIKI_CONCURRENCY", "8"))
+WIKI_TIMEOUT = 10
+USER_AGENT = "Cremlins/1.0"
+
+
+@dataclass
+class CacheEntry:
+    title: str
+    revision: Optional[str]
+    etag: Optional[str]
+    fetched_at: float
+    summary: Optional[str]
+
+
+def title_from_url(wikipedia_url: str) -> Optional[str]:
+    """'https://ru.wikipedia.org/wiki/%D0%9A...' -> 'К...'"""
+    if not wikipedia_url or '/wiki/' not in wikipedia_url:
+        return None
+    return unquote(wikipedia_url.rsplit('/wiki/', 1)[1]) or None
+
+
+class SummaryCache:
+    """Дисковый кэш: <dir>/ab/<sha256(title)>.json, запись атомарная."""
+
+    def __init__(self, directory: str = WIKI_CACHE_DIR) -> None:
+        self.directory = directory
+
+    def _path(self, title: str) -> str:
+        digest = hashlib.sha256(title.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def get(self, title: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(title), encoding="utf-8") as f:
+                return CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def put(self, entry: CacheEntry) -> None:
+        path = self._path(entry.title)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry.__dict__, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def _make_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _fetch(session: requests.Session, cache: SummaryCache, title: str, stats: dict, lock: threading.Lock) -> Optional[str]:
+    def count(key: str) -> None:
+        with lock:
+            stats[key] += 1
+
+    cached = cache.get(title)
+    if cached is not None and time.time() - cached.fetched_at < WIKI_CACHE_MAX_AGE:
+        count("cached")
+        return cached.summary
+
+    headers = {}
+    if cached is not None and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    try:
+        r = session.get(f"{WIKI_API_BASE}/page/summary/{quote(title, safe='')}", headers=headers, timeout=WIKI_TIMEOUT)
+    except requests.RequestException:
+        count("failed")
+        # сеть недоступна — лучше устаревшее описание, чем никакого
+        return cached.summary if cached is not None else None
+
+    if r.status_code == 304 and cached is not None:
+        cached.fetched_at = time.time()
+        cache.put(cached)
+        count("not_modified")
+        return cached.summary
+    if r.status_code != 200:
+        count("failed")
+        return cached.summary if cached is not None else None
+
+    try:
+        j = r.json()
+    except ValueError:
+        count("failed")
+        return cached.summary if cached is not None else None
+    revision = j.get("revision")
+    summary = j.get('extract') or j.get('description') or None
+    cache.put(CacheEntry(
+        title=title,
+        revision=str(revision) if revision is not None else None,
+        etag=r.headers.get("ETag"),
+        fetched_at=time.time(),
+        summary=summary,
+    ))
+    count("fetched")
+    return summary
+
+
+def fetch_summaries(titles: list[str], concurrency: int = WIKI_CONCURRENCY, cache: Optional[SummaryCache] = None) -> dict[str, Optional[str]]:
+    """Описания для статей: {title: summary или None}. Печатает статистику."""
+    cache = cache or SummaryCache()
+    unique = list(dict.fromkeys(titles))
+    stats = {"cached": 0, "not_modified": 0, "fetched": 0, "failed": 0}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    with _make_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        summaries = list(pool.map(lambda t: _fetch(session, cache, t, stats, lock), unique))
+    print(
+        f"Википедия: {len(unique)} статей за {time.perf_counter() - started:.2f} с — "
+        f"из кэша {stats['cached']}, не изменились {stats['not_modified']}, "
+        f"скачано {stats['fetched']}, ошибок {stats['failed']}."
+    )
+    return dict(zip(unique, summaries))
+
+
+def enrich_descriptions(records) -> None:
+    """Заполняет description у записей без описания, но со ссылкой на Википедию."""
+    pending = [
+        (rec, title) for rec in records
+        if not rec.description and (title := title_from_url(rec.wikipedia_url))
+    ]
+    if not pending:
+        return
+    summaries = fetch_summaries([title for _, title in pending])
+    for rec, title in pending:
+        rec.description = summaries.get(title)
+
+
+def serve_stub(port: int) -> None:
+    """Заглушка page/summary для проверки без сети; поддерживает If-None-Match."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            prefix = "/page/summary/"
+            if not self.path.startswith(prefix):
+                self.send_error(404)
+                return
+            title = unquote(self.path[len(prefix):])
+            revision = 1000 + len(title)
+            etag = f'"{revision}/stub"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = json.dumps({
+                "title": title,
+                "revision": str(revision),
+                "extract": f"{title} — заглушка описания из Википедии.",
+            }, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Заглушка Wikipedia REST API: http://localhost:{port}")
+    ThreadingHTTPServer(("", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Описания из Википедии для загрузчика")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stub = sub.add_parser("stub", help="запустить локальную заглушку API")
+    stub.add_argument("--port", type=int, default=8089)
+    fetch = sub.add_parser("fetch", help="получить описания статей (с кэшем)")
+    fetch.add_argument("titles", nargs="+")
+    args = parser.parse_args()
+    if args.command == "stub":
+        serve_stub(args.port)
+    else:
+        for title, summary in fetch_summaries(args.titles).items():
+            print(f"{title}: {summary}")